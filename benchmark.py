@@ -0,0 +1,276 @@
+"""Latency and throughput benchmarks for main.py against synthetic workbooks.
+
+Each size gets its own scratch directory holding a generated
+TamEcoVita_host_file.xlsx, and a fresh import of main.py is driven through
+the Flask test client. Results are written as JSON so runs from different
+versions can be compared:
+
+    python benchmark.py --sizes 1000 10000 100000 --output bench.json
+    python benchmark.py --sizes 1000 --compare bench.json
+"""
+import argparse
+import atexit
+import importlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from openpyxl import Workbook, load_workbook
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+ASSETS = ["logo.png", "invoice_template.docx", "receipt_template.docx"]
+
+FIRST_NAMES = ["Ada", "Bola", "Chidi", "Dami", "Emeka", "Funke", "Gbenga", "Halima", "Ifeoma", "Jide"]
+LAST_NAMES = ["Okafor", "Adeyemi", "Bello", "Eze", "Musa", "Nwosu", "Olawale", "Suleiman", "Uche", "Yusuf"]
+LOCATIONS = ["Wuse", "Garki", "Maitama", "Asokoro", "Jabi", "Gwarinpa", "Lugbe", "Kubwa", "Utako", "Apo"]
+PAYMENTS = ["Cash", "Credit Card", "Debit Card", "Bank Transfer", "PayPal", "Google Pay"]
+PASSWORD = "tamecovita1"
+# Same columns main.HEADERS writes; main is only imported inside a scratch directory.
+HEADERS = [
+    "Receipt No", "Guest Name", "Contact/Email", "Apartment Type",
+    "Place / Location", "Check-In Date", "Check-Out Date",
+    "Number of Nights", "Rate per Night", "VAT", "Total Amount",
+    "Amount Paid", "Payment Method", "Payment Date", "Balance"
+]
+
+
+def synthetic_row(i, rng):
+    check_in = date(2023, 1, 1) + timedelta(days=rng.randrange(3 * 365))
+    nights = rng.randint(1, 14)
+    rate = float(rng.choice([25000, 35000, 50000, 80000]))
+    subtotal = rate * nights
+    vat = subtotal * 0.075
+    total = subtotal + vat
+    paid = float(rng.choice([0, total / 2, total]))
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    return [
+        f"TEC-{i:04d}", name, f"{name.replace(' ', '.').lower()}{i}@example.com",
+        f"{rng.randint(1, 4)} bedroom", rng.choice(LOCATIONS),
+        check_in.isoformat(), (check_in + timedelta(days=nights)).isoformat(),
+        float(nights), rate, vat, total, paid, rng.choice(PAYMENTS),
+        check_in.isoformat(), total - paid,
+    ]
+
+
+def write_workbook(path, size, seed):
+    rng = random.Random(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Reservations")
+    ws.append(HEADERS)
+    for i in range(1, size + 1):
+        ws.append(synthetic_row(i, rng))
+    wb.save(path)
+
+
+def summarise(samples):
+    samples = sorted(samples)
+    n = len(samples)
+    return {
+        "count": n,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": samples[n // 2] * 1000,
+        "p95_ms": samples[min(int(n * 0.95), n - 1)] * 1000,
+        "p99_ms": samples[min(int(n * 0.99), n - 1)] * 1000,
+        "max_ms": samples[-1] * 1000,
+        "throughput_rps": n / sum(samples) if sum(samples) else None,
+    }
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def submit_form(rng):
+    check_in = date(2026, 1, 1) + timedelta(days=rng.randrange(365))
+    return {
+        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "email": "bench@example.com", "total_days": "2",
+        "date_coming": check_in.isoformat(), "date_going": (check_in + timedelta(days=2)).isoformat(),
+        "place": rng.choice(LOCATIONS), "apartment": "2", "reservation_fee": "35000",
+        "payment": "Cash", "date": check_in.isoformat(), "amount_paid": "10000",
+    }
+
+
+def logged_in_client(main):
+    client = main.app.test_client()
+    client.post("/login", data={"password": PASSWORD})
+    return client
+
+
+def run_size(size, args):
+    workdir = tempfile.mkdtemp(prefix=f"tecbench-{size}-")
+    instance = os.path.join(workdir, "instance")
+    os.makedirs(instance)
+    for name in ASSETS:
+        shutil.copy(os.path.join(REPO, name), workdir)
+        if name.endswith(".docx"):
+            shutil.copy(os.path.join(REPO, name), instance)
+    start = time.perf_counter()
+    write_workbook(os.path.join(instance, "TamEcoVita_host_file.xlsx"), size, args.seed)
+    result = {"workbook_build_s": time.perf_counter() - start}
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    sys.modules.pop("main", None)
+    main = None
+    try:
+        start = time.perf_counter()
+        main = importlib.import_module("main")
+        result["import_s"] = time.perf_counter() - start
+        main.create_app(warm=True)
+        result["startup"] = main.STARTUP_REPORT
+        result["workbook_bytes"] = os.path.getsize(main.FILENAME)
+        result["routes"] = bench_routes(main, size, args)
+        result["concurrent"] = bench_concurrent(main, size, args)
+        result["micro"] = bench_micro(main, size, args)
+    finally:
+        if main is not None:
+            # The scratch directory is about to go; don't compact into it at exit.
+            atexit.unregister(main.STORE.compact)
+        os.chdir(cwd)
+        sys.modules.pop("main", None)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def bench_routes(main, size, args):
+    rng = random.Random(args.seed + 1)
+    client = logged_in_client(main)
+    receipt = lambda: f"TEC-{rng.randint(1, size):04d}"
+    routes = {
+        "index": lambda: client.get("/index"),
+        "search": lambda: client.get(f"/search?q={rng.choice(LAST_NAMES).lower()}"),
+        "edit": lambda: client.get(f"/edit/{receipt()}"),
+        "update": lambda: update(main, client, receipt(), rng),
+        "submit": lambda: client.post("/submit", data=submit_form(rng)),
+        "receipt": lambda: client.get(f"/receipt/{receipt()}/word"),
+        "invoice": lambda: client.get(f"/invoice/{receipt()}/download"),
+    }
+    results = {}
+    for name, call in routes.items():
+        start = time.perf_counter()
+        status = call().status_code
+        cold = time.perf_counter() - start
+        results[name] = dict(summarise(timed(call, args.requests)), cold_ms=cold * 1000, status=status)
+    return results
+
+
+def update(main, client, receipt_no, rng):
+    record = main.STORE.find(receipt_no) or {}
+    form = {k: "" if v is None else v for k, v in record.items()}
+    form["Amount Paid"] = str(rng.randint(0, 100000))
+    return client.post(f"/update/{receipt_no}", data=form)
+
+
+def bench_concurrent(main, size, args):
+    """Mixed read load from ``--concurrency`` threads for ``--duration`` seconds."""
+    deadline = time.perf_counter() + args.duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = logged_in_client(main)
+        samples = []
+        while not samples or time.perf_counter() < deadline:
+            path = rng.choice([
+                "/index",
+                f"/search?q={rng.choice(FIRST_NAMES).lower()}",
+                f"/edit/TEC-{rng.randint(1, size):04d}",
+                f"/receipt/TEC-{rng.randint(1, size):04d}/word",
+            ])
+            start = time.perf_counter()
+            client.get(path)
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        samples = [s for batch in pool.map(worker, range(args.concurrency)) for s in batch]
+    elapsed = time.perf_counter() - start
+    return dict(summarise(samples), concurrency=args.concurrency, throughput_rps=len(samples) / elapsed)
+
+
+def bench_micro(main, size, args):
+    out = os.path.join(main.DATA_FOLDER, "bench_fill.docx")
+    record = main.STORE.find("TEC-0001")
+    mapping = {"GUEST_NAME": record["Guest Name"], "RECEIPT_NO": "TEC-0001", "DATE": "2026-01-01"}
+    wb = load_workbook(main.FILENAME)
+    ws = wb["Reservations"]
+    return {
+        "fill_word_template": summarise(timed(lambda: main.fill_word_template(main.RECEIPT_TEMPLATE, out, mapping), args.requests)),
+        "next_id_code": summarise(timed(lambda: main.next_id_code(size), 1000)),
+        "receipt_counter": summarise(timed(main.STORE.counter.take, 200)),
+        "auto_adjust_columns": summarise(timed(lambda: main.auto_adjust_columns(ws), 1 if size > 10000 else 3)),
+    }
+
+
+def git_version():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """Print the p50 change of every route and micro-benchmark present in both reports."""
+    for size, result in new["results"].items():
+        before = old["results"].get(size)
+        if not before:
+            continue
+        for section in ("routes", "micro"):
+            for name, stats in result[section].items():
+                prev = before.get(section, {}).get(name)
+                if prev and prev["p50_ms"]:
+                    change = (stats["p50_ms"] - prev["p50_ms"]) / prev["p50_ms"] * 100
+                    print(f"{size:>7} {section:<6} {name:<20} {prev['p50_ms']:10.2f} -> {stats['p50_ms']:10.2f} ms  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--requests", type=int, default=30, help="timed requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of concurrent load")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_report.json")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directories")
+    args = parser.parse_args()
+
+    # Long intervals keep background compaction out of the measurements.
+    os.environ.setdefault("COMPACT_INTERVAL", "3600")
+    report = {
+        "version": git_version(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "keep")},
+        "results": {},
+    }
+    for size in args.sizes:
+        print(f"Benchmarking {size} reservations...", flush=True)
+        report["results"][str(size)] = run_size(size, args)
+    with open(args.output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Wrote {args.output}")
+    if args.compare:
+        with open(args.compare) as fh:
+            compare(json.load(fh), report)
+
+
+if __name__ == "__main__":
+    main()
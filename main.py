@@ -1,62 +1,1863 @@
+import time
+IMPORT_STARTED = time.perf_counter()
+import io
 import os
 import re
-from flask import Flask, request, redirect, url_for, render_template_string, session, flash, send_from_directory
+import csv
+import zlib
+import copy
+import base64
+import bisect
+import json
+import hashlib
+import hmac
+import shutil
+import sqlite3
+import atexit
+import queue
+import threading
+import multiprocessing
+import uuid
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import OrderedDict
+from contextlib import contextmanager
+import click
+from jinja2 import DictLoader, FileSystemBytecodeCache
+from flask import Flask, Response, g, before_render_template, template_rendered, request, redirect, url_for, render_template, session, flash, send_from_directory, send_file, jsonify
 from werkzeug.security import check_password_hash, generate_password_hash
-from openpyxl import Workbook, load_workbook
-from docx import Document
-from datetime import datetime
+# openpyxl, python-docx and Pillow are imported where they are used, so
+# a worker only loads them once it first touches a workbook or document.
+from datetime import date, datetime, timezone
+from decimal import Decimal, InvalidOperation
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    fcntl = None
+    import msvcrt
 
 # ---------------- CONFIG ----------------
 SITE_NAME = "TamEcoVita Suites"
 APP_SECRET = os.environ.get("APP_SECRET", "change_this_secret_for_prod")
-ADMIN_PASSWORD_HASH = os.environ.get(
-    "ADMIN_PASSWORD_HASH",
-    generate_password_hash(os.environ.get("ADMIN_PASSWORD", "tamecovita1"))
-)
+# Without ADMIN_PASSWORD_HASH, ADMIN_PASSWORD is hashed on first use; see admin_password_hash().
+ADMIN_PASSWORD_HASH = os.environ.get("ADMIN_PASSWORD_HASH")
+WARM_START = os.environ.get("WARM_START", "0") == "1"
+STARTUP_TARGET = float(os.environ.get("STARTUP_TARGET", "1.0"))
 
 DATA_FOLDER = os.path.join(os.getcwd(), "instance")
 os.makedirs(DATA_FOLDER, exist_ok=True)
 
 FILENAME = os.path.join(DATA_FOLDER, "TamEcoVita_host_file.xlsx")
+JOURNAL_FILE = os.path.join(DATA_FOLDER, "TamEcoVita_journal.jsonl")
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "xlsx")
+DATABASE = os.path.join(DATA_FOLDER, "TamEcoVita.db")
+ARCHIVE_FOLDER = os.path.join(DATA_FOLDER, "archive")
+RECEIPT_COUNTER = os.path.join(DATA_FOLDER, "TamEcoVita_receipt_counter")
+RECEIPT_BLOCK = int(os.environ.get("RECEIPT_BLOCK", "1"))
+SNAPSHOT_FOLDER = os.path.join(DATA_FOLDER, "snapshots")
+CHANGES_FILE = os.path.join(DATA_FOLDER, "TamEcoVita_changes.jsonl")
+CHANGES_LIMIT = int(os.environ.get("CHANGES_LIMIT", "500"))
+SNAPSHOT_DEBOUNCE = float(os.environ.get("SNAPSHOT_DEBOUNCE", "2"))  # seconds after a write before the xlsx snapshot is rebuilt
+COMPACT_INTERVAL = float(os.environ.get("COMPACT_INTERVAL", "30"))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+CHANGES_TOKEN = os.environ.get("CHANGES_TOKEN")
+OVERBOOKING_POLICY = os.environ.get("OVERBOOKING_POLICY", "flag")  # "flag" or "reject"
+SEARCH_LIMIT = int(os.environ.get("SEARCH_LIMIT", "200"))
+DASHBOARD_PAGE_SIZE = int(os.environ.get("DASHBOARD_PAGE_SIZE", "50"))
+GROUP_COMMIT_WINDOW = float(os.environ.get("GROUP_COMMIT_WINDOW", "0.005"))
+MODEL_CACHE_SIZE = int(os.environ.get("MODEL_CACHE_SIZE", "2048"))  # parsed reservations kept between requests
 CUSTOMER_FOLDER = os.path.join(DATA_FOLDER, "requests")
+RECEIPT_TEMPLATE = os.path.join(DATA_FOLDER, "receipt_template.docx")
+INVOICE_TEMPLATE = os.path.join(DATA_FOLDER, "invoice_template.docx")
+BULK_WORKERS = int(os.environ.get("BULK_WORKERS", str(os.cpu_count() or 2)))
+DOCUMENT_WORKERS = int(os.environ.get("DOCUMENT_WORKERS", "4"))
+JOB_TTL = int(os.environ.get("JOB_TTL", "3600"))
+JOB_LIMIT = int(os.environ.get("JOB_LIMIT", "200"))  # document jobs kept on disk, finished or not
+JOB_PRUNE_EVERY = int(os.environ.get("JOB_PRUNE_EVERY", "20"))  # enqueues between sweeps of the job folder
+JOB_FOLDER = os.path.join(DATA_FOLDER, "jobs")
+DOCUMENT_CACHE_BYTES = int(os.environ.get("DOCUMENT_CACHE_BYTES", str(32 * 1024 * 1024)))
 os.makedirs(CUSTOMER_FOLDER, exist_ok=True)
+os.makedirs(JOB_FOLDER, exist_ok=True)
+
+LOGO_FILE = os.path.join(os.getcwd(), "logo.png")
+LOGO_WIDTHS = (100, 120, 150, 180, 200, 240, 300, 360)  # 1x and 2x of the sizes the pages display
+LOGO_CACHE_FOLDER = os.path.join(DATA_FOLDER, "logo_cache")
+os.makedirs(LOGO_CACHE_FOLDER, exist_ok=True)
+STARTED_AT = datetime.now(timezone.utc).replace(microsecond=0)
+JINJA_CACHE_FOLDER = os.path.join(DATA_FOLDER, "jinja_cache")
+os.makedirs(JINJA_CACHE_FOLDER, exist_ok=True)
+
+# Page templates are registered by name further down and compiled once;
+# the bytecode cache lets new worker processes skip the compile as well.
+PAGE_TEMPLATES = {}
 
 app = Flask(__name__)
 app.secret_key = APP_SECRET
+app.jinja_options = dict(
+    app.jinja_options,
+    loader=DictLoader(PAGE_TEMPLATES),
+    bytecode_cache=FileSystemBytecodeCache(JINJA_CACHE_FOLDER),
+)
 
 @app.route('/logo.png')
 def serve_logo():
     return send_from_directory(os.getcwd(), 'logo.png')
 
+# ---------------- LOGO ----------------
+class LogoVariants:
+    """Resized, recompressed PNG and WebP copies of the logo.
+
+    Variants are written to ``cache_dir`` under the logo's fingerprint, so
+    only the first process after the logo changes pays for encoding them.
+    Without Pillow every width falls back to the original file.
+    """
+
+    def __init__(self, path, widths, cache_dir):
+        with open(path, "rb") as fh:
+            self.original = fh.read()
+        self.fingerprint = hashlib.sha1(self.original).hexdigest()[:12]
+        self.variants = {}
+        img = None
+        for width in widths:
+            for fmt, options in (("png", {"optimize": True}), ("webp", {"quality": 85, "method": 6})):
+                cached = os.path.join(cache_dir, f"{self.fingerprint}-{width}.{fmt}")
+                if os.path.exists(cached):
+                    with open(cached, "rb") as fh:
+                        data = fh.read()
+                else:
+                    if img is None:
+                        try:
+                            from PIL import Image
+                        except ImportError:
+                            continue
+                        img = Image.open(io.BytesIO(self.original)).convert("RGBA")
+                    height = max(round(img.height * width / img.width), 1)
+                    buf = io.BytesIO()
+                    img.resize((width, height), Image.LANCZOS).save(buf, fmt.upper(), **options)
+                    data = buf.getvalue()
+                    with open(cached + ".tmp", "wb") as fh:
+                        fh.write(data)
+                    os.replace(cached + ".tmp", cached)
+                self.variants[(width, fmt)] = (data, hashlib.sha1(data).hexdigest())
+
+    def get(self, width, accept_webp):
+        """(data, mimetype, etag) for the best variant of ``width``."""
+        for fmt in (("webp", "png") if accept_webp else ("png",)):
+            variant = self.variants.get((width, fmt))
+            if variant:
+                return variant[0], f"image/{fmt}", variant[1]
+        return self.original, "image/png", self.fingerprint
+
+_logo = []
+_logo_lock = threading.Lock()
+
+def get_logo():
+    """The LogoVariants of LOGO_FILE, built on first use; None without a logo."""
+    if not _logo:
+        with _logo_lock:
+            if not _logo:
+                _logo.append(LogoVariants(LOGO_FILE, LOGO_WIDTHS, LOGO_CACHE_FOLDER)
+                             if os.path.exists(LOGO_FILE) else None)
+    return _logo[0]
+
+@app.context_processor
+def logo_helpers():
+    def logo_url(width):
+        logo = get_logo()
+        if logo is None:
+            return "/logo.png"
+        return url_for("serve_logo_variant", width=width, fingerprint=logo.fingerprint)
+    return {"logo_url": logo_url}
+
+@app.route("/logo/<int:width>/<fingerprint>")
+def serve_logo_variant(width, fingerprint):
+    logo = get_logo()
+    if logo is None:
+        return "Logo not found", 404
+    if fingerprint != logo.fingerprint:
+        return redirect(url_for("serve_logo_variant", width=width, fingerprint=logo.fingerprint))
+    data, mimetype, etag = logo.get(width, "image/webp" in request.headers.get("Accept", ""))
+    resp = Response(data, mimetype=mimetype)
+    resp.set_etag(etag)
+    resp.vary.add("Accept")
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 365 * 24 * 3600
+    resp.cache_control.immutable = True
+    return resp.make_conditional(request)
+
 # ---------------- HELPERS ----------------
-def ensure_excel():
-    if not os.path.exists(FILENAME):
+HEADERS = [
+    "Receipt No", "Guest Name", "Contact/Email", "Apartment Type",
+    "Place / Location", "Check-In Date", "Check-Out Date",
+    "Number of Nights", "Rate per Night", "VAT", "Total Amount",
+    "Amount Paid", "Payment Method", "Payment Date", "Balance"
+]
+
+def ensure_excel(path=FILENAME):
+    if not os.path.exists(path):
+        from openpyxl import Workbook
         wb = Workbook()
         ws = wb.active
         ws.title = "Reservations"
-        ws.append([
-            "Receipt No", "Guest Name", "Contact/Email", "Apartment Type",
-            "Place / Location", "Check-In Date", "Check-Out Date",
-            "Number of Nights", "Rate per Night", "VAT", "Total Amount",
-            "Amount Paid", "Payment Method", "Payment Date", "Balance"
-        ])
-        wb.save(FILENAME)
-ensure_excel()
+        ws.append(HEADERS)
+        wb.save(path)
 
 def sanitize_filename(name):
     return re.sub(r'[<>:"/\\|?*]', '_', name)
 
-def next_id_code(ws):
-    count = ws.max_row - 1
+def next_id_code(count):
     return f"TEC-{count+1:04d}"
 
+def iso_date(value):
+    """Normalise a sheet date (string or datetime) to YYYY-MM-DD for comparisons."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    return str(value or "")[:10]
+
+def to_float(value):
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0.0
+
+VAT_RATE = 0.075
+
+def reservation_values(fields):
+    """Row values after Receipt No for a booking given the customer form's
+    fields, with VAT, total and balance worked out."""
+    text = lambda key: str(fields.get(key) or "").strip()
+    total_days = to_float(fields.get("total_days"))
+    reservation_fee = to_float(fields.get("reservation_fee"))
+    amount_paid = to_float(fields.get("amount_paid"))
+    days_cost = reservation_fee * total_days
+    vat = days_cost * VAT_RATE
+    total = days_cost + vat
+    return [
+        text("name"), text("email"), f"{text('apartment')} bedroom", text("place"),
+        text("date_coming"), text("date_going"), total_days, reservation_fee,
+        vat, total, amount_paid, text("payment"), text("date"), total - amount_paid
+    ]
+
+def receipt_number(receipt_no):
+    digits = re.sub(r"\D", "", str(receipt_no or ""))
+    return int(digits) if digits else 0
+
+def receipt_sort_key(receipt_no):
+    # TEC-0009 < TEC-0010 < TEC-10000, whatever the zero padding.
+    digits = re.sub(r"\D", "", str(receipt_no or ""))
+    return (int(digits) if digits else -1, str(receipt_no or ""))
+
+SORT_KEYS = {
+    "receipt": lambda row: receipt_sort_key(row[0]),
+    "check_in": lambda row: iso_date(row[5]),
+    "balance": lambda row: to_float(row[14]),
+}
+
+def cell_width(value):
+    return len(str(value)) if value else 0
+
 def auto_adjust_columns(ws):
     for column in ws.columns:
         if not column[0].column_letter:
             continue
-        max_len = max((len(str(cell.value)) if cell.value else 0) for cell in column)
+        max_len = max(cell_width(cell.value) for cell in column)
         ws.column_dimensions[column[0].column_letter].width = max_len + 5
 
+def to_decimal(value):
+    if isinstance(value, float):
+        value = repr(value)  # 0.1 -> Decimal("0.1"), not its binary expansion
+    try:
+        return Decimal(str(value).strip() or 0)
+    except InvalidOperation:
+        return Decimal(0)
+
+@app.template_filter("money")
+def format_money(value):
+    return f"{value:.2f}"
+
+def format_number(value):
+    """2.0 -> "2", 2.5 -> "2.5"."""
+    return f"{value.normalize():f}" if isinstance(value, Decimal) else str(value)
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(iso_date(value))
+    except ValueError:
+        return None
+
+
+class Reservation:
+    """One reservation row with its dates and money parsed on first use.
+
+    Reads like the ``dict(zip(HEADERS, row))`` it stands in for
+    (``r["Guest Name"]``, ``get``, ``items``), so templates and callers
+    need no changes. Money comes back as ``Decimal`` from the stored
+    columns, so corrections typed into the sheet are respected; only the
+    subtotal, which the sheet does not hold, is computed.
+    """
+
+    __slots__ = ("row", "_parsed")
+    COLUMNS = {header: i for i, header in enumerate(HEADERS)}
+
+    def __init__(self, row):
+        self.row = row
+        self._parsed = None
+
+    @classmethod
+    def of(cls, record):
+        """``record`` as a Reservation, converting a plain mapping if need be."""
+        if isinstance(record, cls):
+            return record
+        return cls(tuple(record.get(header) for header in HEADERS))
+
+    def __getitem__(self, key):
+        return self.row[self.COLUMNS[key]]
+
+    def get(self, key, default=None):
+        i = self.COLUMNS.get(key)
+        return default if i is None or i >= len(self.row) else self.row[i]
+
+    def __contains__(self, key):
+        return key in self.COLUMNS
+
+    def __iter__(self):
+        return iter(self.COLUMNS)
+
+    def __len__(self):
+        return len(self.COLUMNS)
+
+    def keys(self):
+        return self.COLUMNS.keys()
+
+    def items(self):
+        return zip(HEADERS, self.row)
+
+    def to_dict(self):
+        return dict(zip(HEADERS, self.row))
+
+    def __repr__(self):
+        return f"Reservation({self.row[0]!r})"
+
+    def _parse(self):
+        parsed = self._parsed
+        if parsed is None:
+            row = self.row
+            nights, rate = to_decimal(row[7]), to_decimal(row[8])
+            parsed = self._parsed = (
+                parse_date(row[5]), parse_date(row[6]), nights, rate, nights * rate,
+                to_decimal(row[9]), to_decimal(row[10]), to_decimal(row[11]), to_decimal(row[14]),
+            )
+        return parsed
+
+    receipt_no = property(lambda self: self.row[0])
+    guest_name = property(lambda self: self.row[1])
+    check_in = property(lambda self: self._parse()[0])
+    check_out = property(lambda self: self._parse()[1])
+    nights = property(lambda self: self._parse()[2])
+    rate = property(lambda self: self._parse()[3])
+    subtotal = property(lambda self: self._parse()[4])
+    vat = property(lambda self: self._parse()[5])
+    total = property(lambda self: self._parse()[6])
+    paid = property(lambda self: self._parse()[7])
+    balance = property(lambda self: self._parse()[8])
+    # Dates as YYYY-MM-DD when they parse, otherwise as stored.
+    check_in_text = property(lambda self: self.check_in.isoformat() if self.check_in else self.row[5] or "")
+    check_out_text = property(lambda self: self.check_out.isoformat() if self.check_out else self.row[6] or "")
+
+
+class ColumnWidths:
+    """Running per-column max text length, kept up to date one row at a time.
+
+    Gives the same widths as auto_adjust_columns without rescanning the sheet,
+    except that an edit which shortens a value never narrows its column.
+    """
+
+    def __init__(self, lengths=()):
+        self.lengths = list(lengths)
+
+    def observe(self, row):
+        lengths = self.lengths
+        for i, value in enumerate(row):
+            n = cell_width(value)
+            if i >= len(lengths):
+                lengths.append(n)
+            elif n > lengths[i]:
+                lengths[i] = n
+
+    def apply(self, ws):
+        from openpyxl.utils import get_column_letter
+        for i, n in enumerate(self.lengths, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = n + 5
+
+    @classmethod
+    def from_sheet(cls, ws):
+        """Recover widths saved in a sheet, scanning it only if some are missing."""
+        lengths = [None] * ws.max_column
+        for dim in ws.column_dimensions.values():
+            if dim.customWidth and dim.min:
+                for i in range(dim.min, min(dim.max or dim.min, len(lengths)) + 1):
+                    lengths[i - 1] = max(int(dim.width) - 5, 0)
+        if None not in lengths:
+            return cls(lengths)
+        widths = cls()
+        for row in ws.iter_rows(values_only=True):
+            widths.observe(row)
+        return widths
+
+# ---------------- METRICS ----------------
+class Metrics:
+    """Latency histograms in the Prometheus text exposition format."""
+
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, name, labels, seconds):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [[0] * len(self.BUCKETS), 0.0, 0]
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    hist[0][i] += 1
+            hist[1] += seconds
+            hist[2] += 1
+
+    @staticmethod
+    def _labels(labels, **extra):
+        items = list(labels) + list(extra.items())
+        return "{" + ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in items) + "}"
+
+    def render(self, help_text, gauges=()):
+        lines = []
+        with self.lock:
+            items = sorted(self.histograms.items())
+        seen = set()
+        for (name, labels), (buckets, total, count) in items:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {help_text.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+            for bound, n in zip(self.BUCKETS, buckets):
+                lines.append(f"{name}_bucket{self._labels(labels, le=bound)} {n}")
+            lines.append(f"{name}_bucket{self._labels(labels, le='+Inf')} {count}")
+            lines.append(f"{name}_sum{self._labels(labels)} {total}")
+            lines.append(f"{name}_count{self._labels(labels)} {count}")
+        for name, value in gauges:
+            lines.append(f"# HELP {name} {help_text.get(name, name)}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+METRICS_HELP = {
+    "tecovita_request_duration_seconds": "HTTP request latency by route.",
+    "tecovita_phase_duration_seconds": "Time spent in named hot spots.",
+    "tecovita_reservations": "Reservations currently held by the store.",
+    "tecovita_storage_bytes": "Size of the reservation storage file.",
+    "tecovita_journal_entries": "Journal entries not yet compacted.",
+    "tecovita_startup_seconds": "Time from import to ready, as recorded by create_app.",
+}
+
+@contextmanager
+def timed_span(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        METRICS.observe("tecovita_phase_duration_seconds", {"phase": phase}, time.perf_counter() - start)
+
+_render_starts = threading.local()
+
+def _before_render(sender, template, context, **extra):
+    _render_starts.__dict__.setdefault("stack", []).append(time.perf_counter())
+
+def _after_render(sender, template, context, **extra):
+    start = _render_starts.stack.pop()
+    METRICS.observe("tecovita_phase_duration_seconds", {"phase": "render_template"}, time.perf_counter() - start)
+
+before_render_template.connect(_before_render, app)
+template_rendered.connect(_after_render, app)
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request_time(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        METRICS.observe("tecovita_request_duration_seconds",
+                        {"route": route, "method": request.method, "status": response.status_code},
+                        time.perf_counter() - started)
+    return response
+
+
+# ---------------- STORE ----------------
+@contextmanager
+def file_lock(path):
+    """Exclusive cross-process lock held on ``path`` for the duration of the block."""
+    with open(path, "a+b") as fh:
+        if fcntl:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        elif msvcrt:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            elif msvcrt:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ReceiptCounter:
+    """Persistent high-water mark of the receipt numbers handed out.
+
+    The file holds the last number reserved by any process. Each process
+    reserves ``block`` numbers at a time under a cross-process lock and
+    hands them out from memory, so allocation never looks at the
+    reservations themselves. With blocks larger than one, numbers stay
+    unique but processes interleave, and a block unused at exit is
+    skipped.
+    """
+
+    def __init__(self, path, block=1):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.block = max(block, 1)
+        self.lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def _read(self):
+        try:
+            with open(self.path) as fh:
+                return int(fh.read().strip() or 0)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, value):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as fh:
+            fh.write(str(value))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.path)
+
+    def take(self, floor=0, count=1):
+        """Reserve the next ``count`` receipt numbers and return how many
+        came before the first, as next_id_code expects.
+
+        ``floor`` is the highest number known to be in use; it seeds the
+        counter on first run and keeps it ahead of rows added by hand.
+        """
+        with self.lock:
+            if self._end - self._next < count:
+                size = max(self.block, count)
+                with file_lock(self.lock_path):
+                    start = max(self._read() or 0, floor)
+                    self._write(start + size)
+                self._next, self._end = start, start + size
+            self._next += count
+            return self._next - count
+
+    def peek(self):
+        """Last number reserved by any process, or None before the first."""
+        return self._read()
+
+
+class ChangeLog:
+    """Append-only, numbered record of which reservations were inserted, updated or deleted.
+
+    Lines are ``{"seq", "op", "receipt_no", "at"}``. Sequence numbers are
+    assigned by the writer while it holds the store's file lock, so they
+    increase across processes; every process keeps the (seq, op, receipt)
+    triples in memory and reads only what others appended since.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = []
+        self.seqs = []
+        self._offset = 0
+
+    def _refresh(self):
+        with open(self.path, "a+b") as fh:
+            fh.seek(self._offset)
+            data = fh.read()
+        data = data[:data.rfind(b"\n") + 1]
+        for line in data.splitlines():
+            if line.strip():
+                change = json.loads(line)
+                self.entries.append((change["seq"], change["op"], change["receipt_no"]))
+                self.seqs.append(change["seq"])
+        self._offset += len(data)
+
+    def record(self, changes):
+        """Append (op, receipt_no) pairs; the caller holds the store's file lock."""
+        with self.lock:
+            self._refresh()
+            seq = self.seqs[-1] if self.seqs else 0
+            at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            lines = []
+            for op, receipt_no in changes:
+                seq += 1
+                lines.append(json.dumps({"seq": seq, "op": op, "receipt_no": receipt_no, "at": at},
+                                        separators=(",", ":"), default=str).encode() + b"\n")
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                view = memoryview(b"".join(lines))
+                while view:
+                    view = view[os.write(fd, view):]
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._refresh()
+
+    def cursor(self):
+        with self.lock:
+            self._refresh()
+            return self.seqs[-1] if self.seqs else 0
+
+    def since(self, seq, limit):
+        """Up to ``limit`` (seq, op, receipt_no) changes after ``seq``, and whether more follow."""
+        with self.lock:
+            self._refresh()
+            start = bisect.bisect_right(self.seqs, seq)
+            return self.entries[start:start + limit], start + limit < len(self.entries)
+
+
+def read_reservations_sheet(path, sheet="Reservations"):
+    """Return (headers, rows) from a workbook, padding rows to the header width."""
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True)
+    try:
+        ws = wb[sheet]
+        it = ws.iter_rows(values_only=True)
+        headers = list(next(it, HEADERS))
+        width = len(headers)
+        rows = [tuple(row[:width]) + (None,) * (width - len(row)) for row in it]
+    finally:
+        wb.close()
+    return headers, rows
+
+
+class XlsxBackend:
+    """Reservations kept in the Reservations sheet of an .xlsx workbook."""
+
+    name = "xlsx"
+
+    def __init__(self, path, sheet="Reservations"):
+        self.path = path
+        self.sheet = sheet
+        self._wb = None
+        self._widths = None
+        self._saved = None
+        ensure_excel(path)
+
+    def signature(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        with timed_span("load_workbook"):
+            return read_reservations_sheet(self.path, self.sheet)
+
+    def apply(self, entries):
+        # The writable workbook is kept between compactions as long as
+        # nobody else has saved the file since.
+        # Column widths live in the workbook itself and are only widened by
+        # the rows being written.
+        if self._wb is None or self._saved != self.signature():
+            from openpyxl import load_workbook
+            with timed_span("load_workbook"):
+                self._wb = load_workbook(self.path)
+            with timed_span("column_widths"):
+                self._widths = ColumnWidths.from_sheet(self._wb[self.sheet])
+        ws = self._wb[self.sheet]
+        for entry in entries:
+            sheet_row = entry["pos"] + 2
+            if entry["op"] == "append" and sheet_row <= ws.max_row:
+                continue
+            for col, value in enumerate(entry["row"], start=1):
+                ws.cell(row=sheet_row, column=col, value=value)
+            self._widths.observe(entry["row"])
+        with timed_span("column_widths"):
+            self._widths.apply(ws)
+        self._save(self._wb)
+        self._saved = self.signature()
+
+    def replace(self, headers, rows):
+        """Rewrite the sheet to hold exactly ``rows``; positions are renumbered."""
+        from openpyxl import load_workbook
+        with timed_span("load_workbook"):
+            wb = load_workbook(self.path)
+        old = wb[self.sheet]
+        ws = wb.create_sheet(self.sheet + "_new", wb.sheetnames.index(self.sheet))
+        wb.remove(old)
+        ws.title = self.sheet
+        ws.append(list(headers))
+        widths = ColumnWidths()
+        widths.observe(headers)
+        for row in rows:
+            ws.append(list(row))
+            widths.observe(row)
+        widths.apply(ws)
+        self._save(wb)
+        self._wb = None
+
+    def _save(self, wb):
+        # Written beside the workbook and renamed over it: a crash mid-save
+        # leaves the previous file intact, and readers in other processes,
+        # which don't take the lock, never open a half-written zip.
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as fh:
+                with timed_span("wb_save"):
+                    wb.save(fh)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def export_xlsx(self, fh):
+        with open(self.path, "rb") as src:
+            shutil.copyfileobj(src, fh)
+
+
+SQL_COLUMNS = [
+    "receipt_no", "guest_name", "contact", "apartment_type", "location",
+    "check_in", "check_out", "nights", "rate", "vat", "total",
+    "amount_paid", "payment_method", "payment_date", "balance"
+]
+
+class SqliteBackend:
+    """Reservations kept in an SQLite database in WAL mode.
+
+    Rows are keyed by their position so journal entries apply the same way
+    as they do to the workbook; the xlsx is only produced on export.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, seed_from=None):
+        self.path = path
+        self.lock = threading.Lock()
+        created = not os.path.exists(path)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS reservations (pos INTEGER PRIMARY KEY, %s)"
+            % ", ".join(SQL_COLUMNS))
+        self.conn.execute("CREATE INDEX IF NOT EXISTS reservations_receipt_no ON reservations (receipt_no)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS column_widths (col INTEGER PRIMARY KEY, max_len INTEGER)")
+        self.conn.commit()
+        self.widths = ColumnWidths(
+            n for _, n in self.conn.execute("SELECT col, max_len FROM column_widths ORDER BY col"))
+        if not self.widths.lengths:
+            self.widths.observe(HEADERS)
+        if created and seed_from and os.path.exists(seed_from):
+            migrate_xlsx_to_sqlite(seed_from, self)
+
+    def signature(self):
+        sig = []
+        for path in (self.path, self.path + "-wal"):
+            try:
+                st = os.stat(path)
+                sig.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                sig.append(None)
+        return tuple(sig)
+
+    def load(self):
+        with self.lock:
+            cur = self.conn.execute("SELECT %s FROM reservations ORDER BY pos" % ", ".join(SQL_COLUMNS))
+            return list(HEADERS), [tuple(row) for row in cur]
+
+    def apply(self, entries):
+        width = len(SQL_COLUMNS)
+        placeholders = ", ".join("?" * (width + 1))
+        assignments = ", ".join(f"{col} = ?" for col in SQL_COLUMNS)
+        with self.lock, self.conn, timed_span("sqlite_write"):
+            for entry in entries:
+                row = (list(entry["row"]) + [None] * width)[:width]
+                self.widths.observe(row)
+                if entry["op"] == "append":
+                    self.conn.execute(
+                        "INSERT OR IGNORE INTO reservations (pos, %s) VALUES (%s)"
+                        % (", ".join(SQL_COLUMNS), placeholders), [entry["pos"]] + row)
+                else:
+                    self.conn.execute(
+                        f"UPDATE reservations SET {assignments} WHERE pos = ?", row + [entry["pos"]])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO column_widths (col, max_len) VALUES (?, ?)",
+                enumerate(self.widths.lengths))
+
+    def replace(self, headers, rows):
+        """Swap the table contents for ``rows``; positions are renumbered."""
+        width = len(SQL_COLUMNS)
+        rows = [(list(row) + [None] * width)[:width] for row in rows]
+        self.widths = ColumnWidths()
+        self.widths.observe(HEADERS)
+        with self.lock, self.conn, timed_span("sqlite_write"):
+            self.conn.execute("DELETE FROM reservations")
+            self.conn.executemany(
+                "INSERT INTO reservations (pos, %s) VALUES (%s)"
+                % (", ".join(SQL_COLUMNS), ", ".join("?" * (width + 1))),
+                ([pos] + row for pos, row in enumerate(rows)))
+            for row in rows:
+                self.widths.observe(row)
+            self.conn.execute("DELETE FROM column_widths")
+            self.conn.executemany(
+                "INSERT INTO column_widths (col, max_len) VALUES (?, ?)", enumerate(self.widths.lengths))
+
+    def export_xlsx(self, fh):
+        headers, rows = self.load()
+        write_reservations_xlsx(fh, headers, rows, self.widths)
+
+
+def write_reservations_xlsx(fh, headers, rows, widths=None):
+    """Write ``rows`` as a fresh Reservations workbook, streaming them out."""
+    from openpyxl import Workbook
+    if widths is None:
+        widths = ColumnWidths()
+        widths.observe(headers)
+        for row in rows:
+            widths.observe(row)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Reservations")
+    widths.apply(ws)
+    ws.append(list(headers))
+    for row in rows:
+        ws.append(list(row))
+    with timed_span("wb_save"):
+        wb.save(fh)
+
+
+def migrate_xlsx_to_sqlite(xlsx_path, backend):
+    """Copy every row of the Reservations sheet into an empty SQLite backend."""
+    if backend.load()[1]:
+        raise ValueError(f"{backend.path} already holds reservations")
+    _, rows = read_reservations_sheet(xlsx_path)
+    backend.apply([{"op": "append", "pos": pos, "row": list(row)} for pos, row in enumerate(rows)])
+    return len(rows)
+
+
+def make_backend(kind=STORAGE_BACKEND):
+    if kind == "sqlite":
+        return SqliteBackend(DATABASE, seed_from=FILENAME)
+    if kind == "xlsx":
+        return XlsxBackend(FILENAME)
+    raise ValueError(f"Unknown STORAGE_BACKEND {kind!r}")
+
+
+class ReservationArchive:
+    """Past years of reservations, moved out of the active store into sealed workbooks.
+
+    Each partition holds the reservations checking in during one year and
+    is written once, then left read-only. ``manifest.json`` describes every
+    partition, with its report totals, and maps archived receipt numbers
+    to theirs, so a lookup opens the one workbook that holds it; the last
+    few opened are kept.
+    """
+
+    def __init__(self, folder, keep=2):
+        self.folder = folder
+        self.manifest_path = os.path.join(folder, "manifest.json")
+        self.keep = keep
+        self.lock = threading.Lock()
+        self._manifest = {"partitions": {}, "receipts": {}}
+        self._signature = None
+        self._loaded = OrderedDict()
+        self._totals = {}
+
+    def path(self, period):
+        return os.path.join(self.folder, f"TamEcoVita_{period}.xlsx")
+
+    def manifest(self):
+        with self.lock:
+            try:
+                st = os.stat(self.manifest_path)
+                signature = (st.st_mtime_ns, st.st_size)
+            except FileNotFoundError:
+                signature = None
+            if signature != self._signature:
+                if signature is None:
+                    self._manifest = {"partitions": {}, "receipts": {}}
+                else:
+                    with open(self.manifest_path) as fh:
+                        self._manifest = json.load(fh)
+                self._signature = signature
+                self._loaded.clear()
+                self._totals.clear()
+            return self._manifest
+
+    def periods(self):
+        return sorted(self.manifest()["partitions"])
+
+    def last_number(self):
+        return max((p["last_number"] for p in self.manifest()["partitions"].values()), default=0)
+
+    def rows(self, period):
+        """(headers, rows) of one sealed partition."""
+        return read_reservations_sheet(self.path(period))
+
+    def totals(self, period):
+        """ReportAggregates groups of one partition, {dim: {key: totals}}."""
+        totals = self.manifest()["partitions"][period].get("totals")
+        if totals is None:
+            # Partitions sealed before totals were recorded are summed once.
+            totals = self._totals.get(period)
+            if totals is None:
+                aggregates = ReportAggregates()
+                aggregates.rebuild(self.rows(period)[1])
+                totals = self._totals[period] = aggregates.groups
+        return totals
+
+    def find(self, receipt_no):
+        period = self.manifest()["receipts"].get(receipt_no)
+        if period is None:
+            return None
+        with self.lock:
+            records = self._loaded.get(period)
+            if records is None:
+                records = {}
+                for row in self.rows(period)[1]:
+                    records.setdefault(row[0], Reservation(row))
+                self._loaded[period] = records
+                while len(self._loaded) > self.keep:
+                    self._loaded.popitem(last=False)
+            self._loaded.move_to_end(period)
+            return records.get(receipt_no)
+
+    def seal(self, period, headers, rows):
+        """Merge ``rows`` into the partition for ``period`` and seal it again.
+
+        Rows already in the partition under the same receipt number are
+        replaced, so repeating an interrupted archive run is harmless.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        path = self.path(period)
+        incoming = {row[0] for row in rows}
+        merged = list(rows)
+        if os.path.exists(path):
+            merged += [row for row in self.rows(period)[1] if row[0] not in incoming]
+        merged.sort(key=lambda row: receipt_sort_key(row[0]))
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as fh:
+            write_reservations_xlsx(fh, headers, merged)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.chmod(tmp, 0o444)
+        if os.path.exists(path):
+            os.chmod(path, 0o644)  # Windows won't replace a read-only file
+        os.replace(tmp, path)
+
+        manifest = copy.deepcopy(self.manifest())
+        check_ins = sorted(iso_date(row[5]) for row in merged)
+        aggregates = ReportAggregates()
+        aggregates.rebuild(merged)
+        manifest["partitions"][period] = {
+            "file": os.path.basename(path),
+            "rows": len(merged),
+            "first_check_in": check_ins[0],
+            "last_check_in": check_ins[-1],
+            "last_number": max(receipt_number(row[0]) for row in merged),
+            "sealed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "totals": aggregates.groups,
+        }
+        manifest["receipts"].update((row[0], period) for row in merged if row[0] is not None)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as fh:
+            json.dump(manifest, fh, indent=1, default=str)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.manifest_path)
+        return len(merged)
+
+
+SEARCH_FIELDS = ((0, 3), (1, 3), (2, 2), (4, 1))  # (column, weight): receipt, guest, contact, location
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+class SearchIndex:
+    """Incremental word index over receipt number, guest, contact and location.
+
+    Postings map each word to the rows holding it, per field weight. A
+    query term matches a word exactly, as a prefix (a bisect over the
+    sorted vocabulary) or, for terms of three or more characters, anywhere
+    inside it (candidate words come from a trigram index over the
+    vocabulary, not over the rows). Matches come back grouped by score so
+    the caller can stop once it has enough of the best ones.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.vocab = []
+        self.trigrams = {}
+
+    @staticmethod
+    def words(row):
+        for col, weight in SEARCH_FIELDS:
+            value = row[col]
+            if value is not None and value != "":
+                for word in set(TOKEN_RE.findall(str(value).lower())):
+                    yield word, weight
+
+    def rebuild(self, rows):
+        postings = {}
+        for pos, row in enumerate(rows):
+            for word, weight in self.words(row):
+                by_weight = postings.get(word)
+                if by_weight is None:
+                    postings[word] = {weight: {pos}}
+                elif weight in by_weight:
+                    by_weight[weight].add(pos)
+                else:
+                    by_weight[weight] = {pos}
+        self.postings = postings
+        self.vocab = sorted(postings)
+        self.trigrams = {}
+        for word in self.vocab:
+            for i in range(len(word) - 2):
+                self.trigrams.setdefault(word[i:i + 3], set()).add(word)
+
+    def add(self, pos, row):
+        for word, weight in self.words(row):
+            by_weight = self.postings.get(word)
+            if by_weight is None:
+                by_weight = self.postings[word] = {}
+                bisect.insort(self.vocab, word)
+                for i in range(len(word) - 2):
+                    self.trigrams.setdefault(word[i:i + 3], set()).add(word)
+            by_weight.setdefault(weight, set()).add(pos)
+
+    def remove(self, pos, row):
+        for word, weight in self.words(row):
+            by_weight = self.postings.get(word)
+            positions = by_weight.get(weight) if by_weight else None
+            if positions is None:
+                continue
+            positions.discard(pos)
+            if positions:
+                continue
+            del by_weight[weight]
+            if by_weight:
+                continue
+            del self.postings[word]
+            del self.vocab[bisect.bisect_left(self.vocab, word)]
+            for i in range(len(word) - 2):
+                words = self.trigrams[word[i:i + 3]]
+                words.discard(word)
+                if not words:
+                    del self.trigrams[word[i:i + 3]]
+
+    def _term(self, term):
+        """[(score, positions)] for one term, best first, positions disjoint."""
+        groups = {}
+        lo = bisect.bisect_left(self.vocab, term)
+        hi = bisect.bisect_left(self.vocab, term + "\U0010ffff")
+        exact = term in self.postings
+        levels = [(3, [term] if exact else []), (2, self.vocab[lo + exact:hi])]
+        if len(term) >= 3:
+            grams = sorted((self.trigrams.get(term[i:i + 3], set()) for i in range(len(term) - 2)), key=len)
+            inside = set.intersection(*grams) if grams[0] else ()
+            levels.append((1, [w for w in inside if term in w and not w.startswith(term)]))
+        for level, words in levels:
+            for word in words:
+                for weight, positions in self.postings[word].items():
+                    group = groups.get(level * weight)
+                    if group is None:
+                        groups[level * weight] = set(positions)
+                    else:
+                        group |= positions
+        tiers, seen = [], set()
+        for score in sorted(groups, reverse=True):
+            fresh = groups[score] - seen
+            if fresh:
+                tiers.append((score, fresh))
+                seen |= fresh
+        return tiers
+
+    def search(self, query):
+        """Rows matching every term of ``query`` as [(score, positions)], best first.
+
+        A term scores 3 for an exact word, 2 for a word prefix and 1 for a
+        substring, times the field weight; several terms add up.
+        """
+        terms = TOKEN_RE.findall(query.lower())
+        if not terms:
+            return []
+        per_term = [self._term(term) for term in dict.fromkeys(terms)]
+        if len(per_term) == 1:
+            return per_term[0]
+        common = set.intersection(*(set().union(*(p for _, p in tiers)) for tiers in per_term))
+        totals = dict.fromkeys(common, 0)
+        for tiers in per_term:
+            for score, positions in tiers:
+                for pos in positions & common:
+                    totals[pos] += score
+        groups = {}
+        for pos, score in totals.items():
+            groups.setdefault(score, set()).add(pos)
+        return sorted(groups.items(), reverse=True)
+
+
+def stay_span(row):
+    """(first night, checkout) as date ordinals, or None if the dates don't parse."""
+    try:
+        start = date.fromisoformat(iso_date(row[5])).toordinal()
+        end = date.fromisoformat(iso_date(row[6])).toordinal()
+    except ValueError:
+        return None
+    return start, max(end, start + 1)
+
+
+class AvailabilityIndex:
+    """Bookings per (location, apartment type), sorted by check-in.
+
+    An overlap query bisects to the bookings that start before the
+    requested checkout and no earlier than the longest stay recorded for
+    that unit allows, so it stays logarithmic plus the handful of hits.
+    """
+
+    def __init__(self):
+        self.units = {}
+        self.longest = {}
+
+    @staticmethod
+    def unit(row):
+        location = str(row[4] or "").strip()
+        apartment = str(row[3] or "").strip()
+        return (location, apartment) if location else None
+
+    def add(self, pos, row):
+        unit, span = self.unit(row), stay_span(row)
+        if unit is None or span is None:
+            return
+        bisect.insort(self.units.setdefault(unit, []), span + (pos,))
+        self.longest[unit] = max(self.longest.get(unit, 0), span[1] - span[0])
+
+    def remove(self, pos, row):
+        unit, span = self.unit(row), stay_span(row)
+        entries = self.units.get(unit)
+        if not entries or span is None:
+            return
+        i = bisect.bisect_left(entries, span + (pos,))
+        if i < len(entries) and entries[i][2] == pos:
+            del entries[i]
+
+    def overlaps(self, unit, start, end):
+        """Positions of bookings of ``unit`` overlapping nights [start, end)."""
+        entries = self.units.get(unit, ())
+        if not entries:
+            return []
+        lo = bisect.bisect_left(entries, (start - self.longest[unit],))
+        hi = bisect.bisect_left(entries, (end,))
+        return [pos for _, booked_end, pos in entries[lo:hi] if booked_end > start]
+
+
+REPORT_DIMENSIONS = {
+    "day": lambda row: iso_date(row[5]) or "unknown",
+    "month": lambda row: iso_date(row[5])[:7] or "unknown",
+    "location": lambda row: str(row[4] or "unknown"),
+    "apartment": lambda row: str(row[3] or "unknown"),
+    "payment": lambda row: str(row[12] or "unknown"),
+}
+REPORT_MEASURES = ("reservations", "nights", "revenue", "vat", "paid", "balance")
+REPORT_COLUMNS = (7, 10, 9, 11, 14)  # nights, total, VAT, paid, balance
+
+
+class ReportAggregates:
+    """Revenue, VAT and balance totals per day, month, location, apartment and payment method.
+
+    Totals are adjusted by each inserted or removed row; ``rebuild``
+    recomputes everything column by column for a fresh load.
+    """
+
+    def __init__(self):
+        self.groups = {dim: {} for dim in REPORT_DIMENSIONS}
+
+    def add(self, row, sign=1):
+        values = [to_float(row[col]) for col in REPORT_COLUMNS]
+        for dim, key_of in REPORT_DIMENSIONS.items():
+            groups = self.groups[dim]
+            key = key_of(row)
+            totals = groups.get(key)
+            if totals is None:
+                totals = groups[key] = [0, 0.0, 0.0, 0.0, 0.0, 0.0]
+            totals[0] += sign
+            for i, value in enumerate(values, start=1):
+                totals[i] += sign * value
+            if not totals[0]:
+                del groups[key]
+
+    def remove(self, row):
+        self.add(row, sign=-1)
+
+    def rebuild(self, rows):
+        # Columnar pass: convert each numeric column once, then fold every
+        # dimension's key column against them.
+        columns = list(zip(*rows)) if rows else [()] * len(HEADERS)
+        measures = [list(map(to_float, columns[col])) for col in REPORT_COLUMNS]
+        self.groups = {}
+        for dim, key_of in REPORT_DIMENSIONS.items():
+            groups = {}
+            for i, key in enumerate(map(key_of, rows)):
+                totals = groups.get(key)
+                if totals is None:
+                    totals = groups[key] = [0, 0.0, 0.0, 0.0, 0.0, 0.0]
+                totals[0] += 1
+                for j, column in enumerate(measures, start=1):
+                    totals[j] += column[i]
+            self.groups[dim] = groups
+
+    def report(self, dim, extra=()):
+        """Rows of one dimension; ``extra`` are more {key: totals} groups to add in."""
+        groups = self.groups[dim]
+        if extra:
+            groups = {key: list(totals) for key, totals in groups.items()}
+            for more in extra:
+                for key, totals in more.items():
+                    current = groups.setdefault(key, [0] * len(totals))
+                    for i, value in enumerate(totals):
+                        current[i] += value
+        return [
+            dict(key=key, **{m: (round(v, 2) if isinstance(v, float) else v) for m, v in zip(REPORT_MEASURES, totals)})
+            for key, totals in sorted(groups.items())
+        ]
+
+
+class OverbookingError(Exception):
+    def __init__(self, conflicts):
+        super().__init__("Already booked: " + ", ".join(conflicts))
+        self.conflicts = conflicts
+
+
+class ReservationStore:
+    """Process-wide in-memory copy of the reservations held by a backend.
+
+    The backend is read once and served from memory; it is re-read only
+    when its file's mtime/size no longer match what we last loaded or saved.
+    Writes are queued to a single writer thread that group-commits them to a
+    fsync'd JSON-lines journal and periodically folds the journal into the
+    backend in one write; reads always include journal entries that have
+    not been compacted yet. Reservations moved to the ``archive`` are still
+    found by receipt number and their numbers are never handed out again.
+
+    ``backend`` may be a function returning the backend, in which case it
+    is opened on first use rather than when the store is created.
+    """
+
+    def __init__(self, backend, journal_path, archive=None, counter=None, changes=None,
+                 compact_interval=30, commit_window=0.005):
+        self._backend = backend
+        self._backend_lock = threading.Lock()
+        self.archive = archive
+        self.counter = counter
+        self.changes = changes
+        self.listeners = []  # called with no arguments after each commit
+        self.journal_path = journal_path
+        self.lock_path = journal_path + ".lock"
+        self.compact_interval = compact_interval
+        self.commit_window = commit_window
+        self.lock = threading.RLock()
+        self.headers = list(HEADERS)
+        self.rows = []
+        self.index = {}
+        self.sorted = {name: [] for name in SORT_KEYS}
+        self.search_index = None
+        self.availability = AvailabilityIndex()
+        self.reports = ReportAggregates()
+        self.last_number = 0
+        self.models = OrderedDict()
+        self._signature = None
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.writes = 0
+        self.compactions = 0
+        self.batches = 0
+        self.largest_batch = 0
+
+    @property
+    def backend(self):
+        if callable(self._backend):
+            with self._backend_lock:
+                if callable(self._backend):
+                    self._backend = self._backend()
+        return self._backend
+
+    def _journal_size(self):
+        try:
+            return os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return 0
+
+    def _refresh(self):
+        signature = self.backend.signature()
+        if signature != self._signature:
+            self.misses += 1
+            self._load(signature)
+        elif self._journal_size() != self._journal_offset:
+            self.misses += 1
+            self._replay()
+        else:
+            self.hits += 1
+
+    def _load(self, signature):
+        self.headers, self.rows = self.backend.load()
+        self.models = OrderedDict()
+        self._reindex()
+        self._signature = signature
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self.reloads += 1
+        self._replay()
+
+    def _replay(self):
+        """Apply journal entries written since we last read it."""
+        size = self._journal_size()
+        if size < self._journal_offset:
+            # Compacted by another process; its save will show up as a new
+            # workbook signature, so just start from the top of the journal.
+            self._journal_offset = 0
+            self._journal_entries = 0
+        with open(self.journal_path, "a+b") as fh:
+            fh.seek(self._journal_offset)
+            data = fh.read()
+        # A writer in another process may be mid-line; stop at the last newline.
+        data = data[:data.rfind(b"\n") + 1]
+        for line in data.splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+                self._journal_entries += 1
+        self._journal_offset += len(data)
+
+    def _apply(self, entry):
+        # Entries carry the row position they were written at, which makes
+        # replaying a journal over a workbook that already holds them a no-op.
+        pos = entry["pos"]
+        row = self._fit(entry["row"])
+        if entry["op"] == "append":
+            if pos < len(self.rows):
+                return
+            self.rows.append(row)
+            self.index.setdefault(row[0], pos)
+            self._on_insert(pos, row)
+        elif entry["op"] == "update":
+            old = self.rows[pos]
+            self._on_remove(pos, old)
+            self.rows[pos] = row
+            if row[0] != old[0]:
+                if self.index.get(old[0]) == pos:
+                    del self.index[old[0]]
+                self.index.setdefault(row[0], pos)
+            self._on_insert(pos, row)
+
+    def _fit(self, row):
+        width = len(self.headers)
+        return tuple(row[:width]) + (None,) * (width - len(row))
+
+    def _reindex(self):
+        # Receipt No -> position in self.rows (sheet row = position + 2).
+        # The first occurrence wins, as it did with the old top-down scan.
+        self.index = {}
+        for pos, row in enumerate(self.rows):
+            if row[0] is not None and row[0] not in self.index:
+                self.index[row[0]] = pos
+        # Secondary indexes are rebuilt by sorting once rather than by
+        # inserting row by row.
+        self.sorted = {
+            name: sorted((key(row), pos) for pos, row in enumerate(self.rows))
+            for name, key in SORT_KEYS.items()
+        }
+        # The search index is built on the first search after a reload, so
+        # reloads triggered by other processes' writes don't pay for it.
+        self.search_index = None
+        self.availability = AvailabilityIndex()
+        for pos, row in enumerate(self.rows):
+            self.availability.add(pos, row)
+        self.reports = ReportAggregates()
+        self.reports.rebuild(self.rows)
+        self.last_number = max(
+            max((receipt_number(row[0]) for row in self.rows), default=0),
+            self.archive.last_number() if self.archive else 0)
+
+    def _on_insert(self, pos, row):
+        for name, key in SORT_KEYS.items():
+            bisect.insort(self.sorted[name], (key(row), pos))
+        if self.search_index is not None:
+            self.search_index.add(pos, row)
+        self.availability.add(pos, row)
+        self.reports.add(row)
+        self.last_number = max(self.last_number, receipt_number(row[0]))
+
+    def _on_remove(self, pos, row):
+        for name, key in SORT_KEYS.items():
+            entries = self.sorted[name]
+            i = bisect.bisect_left(entries, (key(row), pos))
+            if i < len(entries) and entries[i][1] == pos:
+                del entries[i]
+        if self.search_index is not None:
+            self.search_index.remove(pos, row)
+        self.availability.remove(pos, row)
+        self.reports.remove(row)
+
+    def _model(self, pos):
+        # The most recently used MODEL_CACHE_SIZE reservations are kept, so
+        # the rows pages and lookups keep returning to don't re-parse their
+        # dates and money on every request.
+        row = self.rows[pos]
+        model = self.models.get(pos)
+        if model is not None and model.row is row:
+            self.models.move_to_end(pos)
+            return model
+        model = self.models[pos] = Reservation(row)
+        self.models.move_to_end(pos)
+        if len(self.models) > MODEL_CACHE_SIZE:
+            self.models.popitem(last=False)
+        return model
+
+    def page(self, sort="receipt", descending=False, size=50, cursor=None):
+        """One page of records in ``sort`` order, starting after ``cursor``.
+
+        Cursors are the (sort key, position) of the last row of the previous
+        page, so each page costs a bisect plus ``size`` rows however many
+        reservations came before it. Returns (records, next_cursor).
+        """
+        with self.lock:
+            self._refresh()
+            entries = self.sorted[sort]
+            if descending:
+                end = bisect.bisect_left(entries, cursor) if cursor else len(entries)
+                chunk = entries[max(end - size, 0):end][::-1]
+                more = end - size > 0
+            else:
+                start = bisect.bisect_right(entries, cursor) if cursor else 0
+                chunk = entries[start:start + size]
+                more = start + size < len(entries)
+            records = [self._model(pos) for _, pos in chunk]
+            return records, (chunk[-1] if more and chunk else None)
+
+    def all(self):
+        with self.lock:
+            self._refresh()
+            return list(self.rows)
+
+    def records(self):
+        with self.lock:
+            self._refresh()
+            # Whole-table scans would flush the cache, so they get fresh models.
+            return [Reservation(row) for row in self.rows]
+
+    def find(self, receipt_no):
+        with self.lock:
+            self._refresh()
+            pos = self.index.get(receipt_no)
+            if pos is not None:
+                return self._model(pos)
+        return self.archive.find(receipt_no) if self.archive else None
+
+    def append(self, values, reject_overlap=False):
+        """Append a reservation and return its newly allocated receipt number.
+
+        With ``reject_overlap`` the booking is refused with OverbookingError
+        if its unit is already booked for any of the same nights.
+        """
+        return self._submit("append", [list(values)], reject_overlap)
+
+    def append_many(self, values_list, reject_overlap=False):
+        """Append many reservations in one journal write.
+
+        Returns one entry per row: its receipt number, or an
+        OverbookingError if ``reject_overlap`` refused it.
+        """
+        return self._submit("append_many", [list(values) for values in values_list], reject_overlap)
+
+    def update(self, receipt_no, form):
+        """Overwrite a row from ``form`` values; returns False if not found."""
+        return self._submit("update", receipt_no, {h: form.get(h, "") for h in self.headers})
+
+    def _submit(self, op, *args):
+        # All mutations go through the writer thread, which allocates receipt
+        # numbers in order and makes each batch durable with one fsync.
+        future = Future()
+        self._queue.put((op, args, future))
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._writer_loop, name="reservation-writer", daemon=True)
+                self._writer.start()
+        return future.result()
+
+    def _writer_loop(self):
+        last_compaction = time.monotonic()
+        while True:
+            timeout = max(self.compact_interval - (time.monotonic() - last_compaction), 0)
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+                deadline = time.monotonic() + self.commit_window
+                while True:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                pass
+            if batch:
+                self._commit(batch)
+            if time.monotonic() - last_compaction >= self.compact_interval:
+                try:
+                    self.compact()
+                except Exception:
+                    app.logger.exception("Journal compaction failed")
+                last_compaction = time.monotonic()
+
+    def _commit(self, batch):
+        # Every failure, taking the file lock included, goes to the waiting
+        # callers; the writer thread itself carries on.
+        try:
+            results = self._commit_locked(batch)
+        except BaseException as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for future, result in results:
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        for listener in self.listeners:
+            try:
+                listener()
+            except Exception:
+                app.logger.exception("Commit listener failed")
+
+    def _commit_locked(self, batch):
+        """Apply and journal ``batch``; returns (future, result) pairs."""
+        results = []
+        with self.lock, file_lock(self.lock_path):
+            try:
+                self._refresh()
+                lines = []
+                changed = []
+                for op, args, future in batch:
+                    if op == "update":
+                        receipt_no, values = args
+                        pos = self.index.get(receipt_no)
+                        if pos is None:
+                            results.append((future, False))
+                            continue
+                        entry = {"op": "update", "pos": pos, "row": self._coerce(self.rows[pos], values)}
+                        self._apply(entry)
+                        lines.append(json.dumps(entry, separators=(",", ":"), default=str).encode() + b"\n")
+                        # A new receipt number retires the old one for sync clients.
+                        if entry["row"][0] != receipt_no:
+                            changed.append(("delete", receipt_no))
+                            changed.append(("insert", entry["row"][0]))
+                        else:
+                            changed.append(("update", receipt_no))
+                        results.append((future, True))
+                        continue
+                    values_list, reject_overlap = args
+                    base = len(self.rows)
+                    accepted, clashes = list(range(len(values_list))), {}
+                    if reject_overlap:
+                        # Overlaps are settled before any number is reserved,
+                        # against the store and the rows accepted earlier in
+                        # this batch (at the positions they will take), so the
+                        # accepted rows take their numbers in one go.
+                        accepted, pending = [], AvailabilityIndex()
+                        for i, values in enumerate(values_list):
+                            row = [None] + values
+                            unit, span = AvailabilityIndex.unit(row), stay_span(row)
+                            earlier = pending.overlaps(unit, *span) if unit and span else []
+                            conflicts = self._conflicts(row)
+                            if conflicts or earlier:
+                                clashes[i] = conflicts, earlier
+                                continue
+                            pending.add(base + len(accepted), row)
+                            accepted.append(i)
+                    receipts = self._next_receipts(len(accepted)) if accepted else []
+                    outcome = [None] * len(values_list)
+                    for i, receipt_no in zip(accepted, receipts):
+                        entry = {"op": "append", "pos": len(self.rows), "row": [receipt_no] + values_list[i]}
+                        self._apply(entry)
+                        lines.append(json.dumps(entry, separators=(",", ":"), default=str).encode() + b"\n")
+                        changed.append(("insert", receipt_no))
+                        outcome[i] = receipt_no
+                    for i, (conflicts, earlier) in clashes.items():
+                        outcome[i] = OverbookingError(conflicts + [receipts[pos - base] for pos in earlier])
+                    results.append((future, outcome if op == "append_many" else outcome[0]))
+                if lines:
+                    self._write_journal(b"".join(lines))
+                    if self.changes is not None:
+                        self.changes.record(changed)
+                    self._journal_entries += len(lines)
+                    self.writes += len(lines)
+                    self.batches += 1
+                    self.largest_batch = max(self.largest_batch, len(lines))
+            except BaseException:
+                # Memory may now hold rows that never reached the journal.
+                self._signature = None
+                raise
+        return results
+
+    def _next_receipt(self):
+        if self.counter is None:
+            return next_id_code(self.last_number)
+        while True:
+            receipt_no = next_id_code(self.counter.take(self.last_number))
+            if receipt_no not in self.index:
+                return receipt_no
+
+    def _next_receipts(self, count):
+        if self.counter is None:
+            return [next_id_code(self.last_number + i) for i in range(count)]
+        start = self.counter.take(self.last_number, count)
+        receipts = [next_id_code(start + i) for i in range(count)]
+        return [r if r not in self.index else self._next_receipt() for r in receipts]
+
+    def _coerce(self, old_row, values):
+        row = []
+        for header, old in zip(self.headers, old_row):
+            val = values.get(header, "")
+            if isinstance(old, (int, float)) and not isinstance(old, bool):
+                try:
+                    val = float(val)
+                except:
+                    pass
+            row.append(val)
+        return row
+
+    def _conflicts(self, row, exclude=None):
+        unit, span = AvailabilityIndex.unit(row), stay_span(row)
+        if unit is None or span is None:
+            return []
+        return [self.rows[pos][0] for pos in self.availability.overlaps(unit, *span) if pos != exclude]
+
+    def conflicts(self, location, apartment_type, check_in, check_out, exclude=None):
+        """Receipt numbers already booked for this unit on any of the nights."""
+        row = [None, None, None, apartment_type, location, check_in, check_out]
+        with self.lock:
+            self._refresh()
+            return self._conflicts(row, self.index.get(exclude))
+
+    def availability_for(self, check_in, check_out, location=None, apartment_type=None):
+        """Every known unit (optionally filtered) with its conflicting bookings."""
+        span = stay_span([None] * 5 + [check_in, check_out])
+        if span is None:
+            raise ValueError("check-in and check-out must be YYYY-MM-DD dates")
+        if iso_date(check_out) <= iso_date(check_in):
+            raise ValueError("check-out must be after check-in")
+        with self.lock:
+            self._refresh()
+            units = []
+            for unit in sorted(self.availability.units):
+                if location and unit[0] != location or apartment_type and unit[1] != apartment_type:
+                    continue
+                conflicts = [self.rows[pos][0] for pos in self.availability.overlaps(unit, *span)]
+                units.append({"location": unit[0], "apartment_type": unit[1],
+                              "available": not conflicts, "conflicts": conflicts})
+            return units
+
+    def report(self, dim):
+        """Totals by ``dim`` over the active reservations and every archived year."""
+        archived = [self.archive.totals(period)[dim] for period in self.archive.periods()] if self.archive else ()
+        with self.lock:
+            self._refresh()
+            return self.reports.report(dim, archived)
+
+    def search(self, query="", check_in_from=None, check_in_to=None,
+               check_out_from=None, check_out_to=None, limit=200):
+        """Ranked records matching ``query`` and the stay-date ranges.
+
+        Returns (records, total matches); at most ``limit`` records.
+        """
+        with self.lock:
+            self._refresh()
+            if not TOKEN_RE.search(query):
+                positions = self._check_in_range(check_in_from, check_in_to)
+                if check_out_from or check_out_to:
+                    positions = [pos for pos in positions if self._checks_out(pos, check_out_from, check_out_to)]
+                return [self._model(pos) for pos in positions[:limit]], len(positions)
+            if self.search_index is None:
+                self.search_index = SearchIndex()
+                self.search_index.rebuild(self.rows)
+            tiers = self.search_index.search(query)
+            if check_in_from or check_in_to:
+                in_range = set(self._check_in_range(check_in_from, check_in_to))
+                tiers = [(score, positions & in_range) for score, positions in tiers]
+            if check_out_from or check_out_to:
+                tiers = [
+                    (score, {pos for pos in positions if self._checks_out(pos, check_out_from, check_out_to)})
+                    for score, positions in tiers
+                ]
+            # Best score first, receipt order within a score; only as many
+            # tiers are ordered as it takes to fill the page.
+            ranked = []
+            for score, positions in tiers:
+                if len(ranked) >= limit:
+                    break
+                ranked += self._in_receipt_order(positions, limit - len(ranked))
+            total = sum(len(positions) for _, positions in tiers)
+            return [self._model(pos) for pos in ranked], total
+
+    def _check_in_range(self, check_in_from=None, check_in_to=None):
+        """Positions checking in within the range, by check-in; all rows by receipt when unbounded."""
+        if not (check_in_from or check_in_to):
+            return [pos for _, pos in self.sorted["receipt"]]
+        entries = self.sorted["check_in"]
+        lo = bisect.bisect_left(entries, (check_in_from or "0",))
+        hi = bisect.bisect_right(entries, (check_in_to or "9", float("inf")))
+        return [pos for _, pos in entries[lo:hi]]
+
+    def _checks_out(self, pos, check_out_from, check_out_to):
+        return (check_out_from or "0") <= iso_date(self.rows[pos][6]) <= (check_out_to or "9")
+
+    def _in_receipt_order(self, positions, count):
+        """The first ``count`` of ``positions`` in receipt order."""
+        if len(positions) <= 8 * count:
+            return sorted(positions, key=lambda pos: receipt_sort_key(self.rows[pos][0]))[:count]
+        found = []
+        for _, pos in self.sorted["receipt"]:
+            if pos in positions:
+                found.append(pos)
+                if len(found) == count:
+                    break
+        return found
+
+    def _write_journal(self, data):
+        fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            view = memoryview(data)
+            with timed_span("journal_commit"):
+                while view:
+                    view = view[os.write(fd, view):]
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._journal_offset += len(data)
+
+    def compact(self):
+        """Fold all journal entries into the backend with a single write."""
+        if callable(self._backend):
+            return False  # never opened here; nothing of ours to fold in
+        with self.lock, file_lock(self.lock_path):
+            return self._compact()
+
+    def _compact(self):
+        self._refresh()
+        if not self._journal_offset:
+            return False
+        with open(self.journal_path, "rb") as fh:
+            data = fh.read(self._journal_offset)
+        self.backend.apply([json.loads(line) for line in data.splitlines() if line.strip()])
+        self._signature = self.backend.signature()
+        with open(self.journal_path, "r+b") as fh:
+            fh.truncate(0)
+            os.fsync(fh.fileno())
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self.compactions += 1
+        return True
+
+    def export_xlsx(self, fh):
+        with self.lock:
+            self.compact()
+            self.backend.export_xlsx(fh)
+
+    def _version(self):
+        # Backend signature plus journal length identifies the contents.
+        return hashlib.sha1(repr((self._signature, self._journal_offset)).encode()).hexdigest()[:16]
+
+    def version(self):
+        with self.lock:
+            self._refresh()
+            return self._version()
+
+    def snapshot(self, check_in_from=None, check_in_to=None):
+        """(version, headers, rows) as of now, in sheet order, optionally
+        limited to a range of check-in dates."""
+        with self.lock:
+            self._refresh()
+            version = self._version()
+            if check_in_from or check_in_to:
+                rows = [self.rows[pos] for pos in sorted(self._check_in_range(check_in_from, check_in_to))]
+            else:
+                rows = list(self.rows)
+            return version, list(self.headers), rows
+
+    def period_rows(self, period):
+        """The active reservations checking in during ``period`` (YYYY)."""
+        with self.lock:
+            self._refresh()
+            return [row for row in self.rows if iso_date(row[5])[:4] == period]
+
+    def archive_before(self, cutoff):
+        """Move reservations checking in before ``cutoff`` (YYYY-MM-DD) into
+        sealed per-year partitions and drop them from the backend.
+
+        Returns {year: rows moved}.
+        """
+        with self.lock, file_lock(self.lock_path):
+            self._compact()
+            keep, moved = [], {}
+            for row in self.rows:
+                check_in = iso_date(row[5])
+                if re.fullmatch(r"\d{4}-\d{2}-\d{2}", check_in) and check_in < cutoff:
+                    moved.setdefault(check_in[:4], []).append(row)
+                else:
+                    keep.append(row)
+            if not moved:
+                return {}
+            # Partitions are sealed before the rows leave the backend; a run
+            # interrupted in between just seals the same rows again next time.
+            for period, rows in sorted(moved.items()):
+                self.archive.seal(period, self.headers, rows)
+            self.backend.replace(self.headers, keep)
+            self._signature = None
+            self._refresh()
+            return {period: len(rows) for period, rows in moved.items()}
+
+    def stats(self):
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "writes": self.writes,
+            "compactions": self.compactions,
+            "batches": self.batches,
+            "largest_batch": self.largest_batch,
+            "journal_entries": self._journal_entries,
+            "rows": len(self.rows),
+            "archived_periods": self.archive.periods() if self.archive else [],
+            "receipt_counter": self.counter.peek() if self.counter else None,
+        }
+
+ARCHIVE = ReservationArchive(ARCHIVE_FOLDER)
+STORE = ReservationStore(make_backend, JOURNAL_FILE, archive=ARCHIVE,
+                         counter=ReceiptCounter(RECEIPT_COUNTER, block=RECEIPT_BLOCK),
+                         changes=ChangeLog(CHANGES_FILE),
+                         compact_interval=COMPACT_INTERVAL, commit_window=GROUP_COMMIT_WINDOW)
+atexit.register(STORE.compact)
+
 
 # ---------------- TEMPLATES ----------------
 login_template = """<!doctype html>
@@ -115,7 +1916,7 @@ input[type="submit"]:hover {
 </style>
 
 <div class="login-container">
-    <img src="/logo.png" class="logo" alt="Logo">
+    <img src="{{ logo_url(120) }}" srcset="{{ logo_url(240) }} 2x" class="logo" alt="Logo">
     <h2>Admin Login</h2>
     <form method="post">
         <input type="password" name="password" placeholder="Enter Password" required>
@@ -207,7 +2008,7 @@ a:hover {
 </style>
 
 <header>
-    <img src="/logo.png" alt="Logo">
+    <img src="{{ logo_url(100) }}" srcset="{{ logo_url(200) }} 2x" alt="Logo">
     <h2>{{ SITE_NAME }} - Admin Dashboard</h2>
 </header>
 
@@ -219,13 +2020,21 @@ a:hover {
 </div>
 <h3>Reservations</h3>
 <table>
-<tr><th>Receipt</th><th>Guest</th><th>Check-In</th><th>Check-Out</th><th>Actions</th></tr>
+<tr>
+<th><a style="color: white" href="{{ url_for('index', sort='receipt', order='desc' if sort == 'receipt' and order == 'asc' else 'asc', size=size) }}">Receipt</a></th>
+<th>Guest</th>
+<th><a style="color: white" href="{{ url_for('index', sort='check_in', order='desc' if sort == 'check_in' and order == 'asc' else 'asc', size=size) }}">Check-In</a></th>
+<th>Check-Out</th>
+<th><a style="color: white" href="{{ url_for('index', sort='balance', order='desc' if sort == 'balance' and order == 'asc' else 'asc', size=size) }}">Balance</a></th>
+<th>Actions</th>
+</tr>
 {% for row in rows %}
 <tr>
 <td>{{ row['Receipt No'] }}</td>
 <td>{{ row['Guest Name'] }}</td>
-<td>{{ row['Check-In Date'] }}</td>
-<td>{{ row['Check-Out Date'] }}</td>
+<td>{{ row.check_in_text }}</td>
+<td>{{ row.check_out_text }}</td>
+<td>{{ row.balance|money }}</td>
 <td class="actions">
 <a href="{{ url_for('edit', receipt_no=row['Receipt No']) }}">Edit</a> |
 <a href="{{ url_for('download_word_receipt', receipt_no=row['Receipt No']) }}">Receipt</a>|
@@ -234,6 +2043,10 @@ a:hover {
 </tr>
 {% endfor %}
 </table>
+<div class="top-links" style="margin-top: 20px">
+<a href="{{ url_for('index', sort=sort, order=order, size=size) }}">First page</a>
+{% if next_cursor %}<a href="{{ url_for('index', sort=sort, order=order, size=size, cursor=next_cursor) }}">Next page</a>{% endif %}
+</div>
 </div>
 """
 
@@ -251,17 +2064,24 @@ edit_template = """<!doctype html><title>Edit Reservation</title>
 search_template = """<!doctype html><title>Search Reservations</title>
 <h2>Search</h2>
 <form method="get">
-<input type="text" name="q" placeholder="Search by guest name">
+<input type="text" name="q" value="{{ args.get('q', '') }}" placeholder="Guest, email, location or receipt">
+<label>Check-in from</label> <input type="date" name="check_in_from" value="{{ args.get('check_in_from', '') }}">
+<label>to</label> <input type="date" name="check_in_to" value="{{ args.get('check_in_to', '') }}">
+<label>Check-out from</label> <input type="date" name="check_out_from" value="{{ args.get('check_out_from', '') }}">
+<label>to</label> <input type="date" name="check_out_to" value="{{ args.get('check_out_to', '') }}">
 <input type="submit" value="Search">
 </form>
+<p>{{ total }} match{{ 'es' if total != 1 }}{% if total > rows|length %}, showing the first {{ rows|length }}{% endif %}</p>
 <table border="1">
-<tr><th>Receipt</th><th>Guest</th><th>Check-In</th><th>Check-Out</th></tr>
+<tr><th>Receipt</th><th>Guest</th><th>Contact</th><th>Location</th><th>Check-In</th><th>Check-Out</th></tr>
 {% for row in rows %}
 <tr>
 <td>{{ row['Receipt No'] }}</td>
 <td>{{ row['Guest Name'] }}</td>
-<td>{{ row['Check-In Date'] }}</td>
-<td>{{ row['Check-Out Date'] }}</td>
+<td>{{ row['Contact/Email'] }}</td>
+<td>{{ row['Place / Location'] }}</td>
+<td>{{ row.check_in_text }}</td>
+<td>{{ row.check_out_text }}</td>
 </tr>
 {% endfor %}
 </table>
@@ -269,82 +2089,710 @@ search_template = """<!doctype html><title>Search Reservations</title>
 """
 
 # ---------------- UTILITY ----------------
+PLACEHOLDER_RE = re.compile(r"\{([A-Z0-9_]+)\}")
+
+class DocxTemplate:
+    """A .docx template parsed once, with its placeholders compiled to a plan.
+
+    The plan records, for every paragraph holding a ``{KEY}`` placeholder
+    (body text and table cells alike), the path to that paragraph and its
+    text split into literal and key segments. Rendering deep-copies the
+    cached document and rewrites only those paragraphs, so placeholders
+    split across runs are filled too.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        st = os.stat(path)
+        self.signature = (st.st_mtime_ns, st.st_size)
+        with open(path, "rb") as fh:
+            data = fh.read()
+        self.version = hashlib.sha1(data).hexdigest()[:12]
+        from docx import Document
+        from docx.oxml.ns import qn
+        from docx.text.paragraph import Paragraph
+        self.document = Document(io.BytesIO(data))
+        self.plan = []
+        body = self.document.element.body
+        for p in body.iter(qn("w:p")):
+            text = "".join(r.text for r in Paragraph(p, None).runs)
+            parts = PLACEHOLDER_RE.split(text)
+            if len(parts) == 1:
+                continue
+            path_to_p = []
+            el = p
+            while el is not body:
+                parent = el.getparent()
+                path_to_p.append(parent.index(el))
+                el = parent
+            # Odd positions of the split hold placeholder names.
+            self.plan.append((tuple(reversed(path_to_p)), parts))
+
+    def render(self, mapping):
+        with timed_span("fill_word_template"):
+            return self._render(mapping)
+
+    def _render(self, mapping):
+        from docx.text.paragraph import Paragraph
+        doc = copy.deepcopy(self.document)
+        body = doc.element.body
+        for path_to_p, parts in self.plan:
+            el = body
+            for i in path_to_p:
+                el = el[i]
+            text = "".join(
+                part if i % 2 == 0 else (str(mapping[part]) if part in mapping else f"{{{part}}}")
+                for i, part in enumerate(parts))
+            runs = Paragraph(el, None).runs
+            runs[0].text = text
+            for run in runs[1:]:
+                run.text = ""
+        return doc
+
+
+class DocxTemplateCache:
+    """Compiled templates by path, recompiled when the file changes on disk."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.templates = {}
+
+    def get(self, path):
+        st = os.stat(path)
+        template = self.templates.get(path)
+        if template is None or template.signature != (st.st_mtime_ns, st.st_size):
+            with self.lock:
+                template = DocxTemplate(path)
+                self.templates[path] = template
+        return template
+
+DOCX_TEMPLATES = DocxTemplateCache()
+
+
+def precompile_docx_templates():
+    for path in (RECEIPT_TEMPLATE, INVOICE_TEMPLATE):
+        if os.path.exists(path):
+            DOCX_TEMPLATES.get(path)
+
+
 def fill_word_template(template_path, output_path, mapping):
     """Replaces placeholders in a Word file based on a dict mapping."""
-    doc = Document(template_path)
-    for p in doc.paragraphs:
-        for key, val in mapping.items():
-            if f"{{{key}}}" in p.text:
-                p.text = p.text.replace(f"{{{key}}}", str(val))
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for key, val in mapping.items():
-                    if f"{{{key}}}" in cell.text:
-                        cell.text = cell.text.replace(f"{{{key}}}", str(val))
-    doc.save(output_path)
+    DOCX_TEMPLATES.get(template_path).render(mapping).save(output_path)
     return output_path
 
 
+class DocumentCache:
+    """Rendered documents keyed by a hash of template version and mapping.
+
+    Entries are evicted least-recently-used once their total size passes
+    ``max_bytes``; all documents rendered for a receipt can be dropped at
+    once when the reservation changes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.by_receipt = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(template, mapping):
+        payload = json.dumps(mapping, sort_keys=True, default=str)
+        return hashlib.sha256(f"{template.path}\0{template.version}\0{payload}".encode()).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, receipt_no, data):
+        with self.lock:
+            if key in self.entries or len(data) > self.max_bytes:
+                return
+            self.entries[key] = (receipt_no, data)
+            self.by_receipt.setdefault(receipt_no, set()).add(key)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                old_key, (old_receipt, old) = self.entries.popitem(last=False)
+                self.size -= len(old)
+                self.evictions += 1
+                keys = self.by_receipt.get(old_receipt)
+                keys.discard(old_key)
+                if not keys:
+                    del self.by_receipt[old_receipt]
+
+    def invalidate(self, receipt_no):
+        with self.lock:
+            for key in self.by_receipt.pop(receipt_no, ()):
+                self.size -= len(self.entries.pop(key)[1])
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+DOCUMENT_CACHE = DocumentCache(DOCUMENT_CACHE_BYTES)
+
+
+def render_word_template(template_path, receipt_no, mapping):
+    """Return the filled document as bytes, from the cache when possible."""
+    template = DOCX_TEMPLATES.get(template_path)
+    key = DocumentCache.key(template, mapping)
+    data = DOCUMENT_CACHE.get(key)
+    if data is None:
+        buf = io.BytesIO()
+        doc = template.render(mapping)
+        with timed_span("docx_save"):
+            doc.save(buf)
+        data = buf.getvalue()
+        DOCUMENT_CACHE.put(key, receipt_no, data)
+    return data
+
+
 def generate_invoice(receipt_no, record):
-    template_path = os.path.join(DATA_FOLDER, "invoice_template.docx")
-    guest_clean = sanitize_filename(record.get("Guest Name", "Guest"))
-    output_path = os.path.join(DATA_FOLDER, f"Invoice_{guest_clean}.docx")
+    template_path = INVOICE_TEMPLATE
+    record = Reservation.of(record)
+    guest_clean = sanitize_filename(record.get("Guest Name") or "Guest")
+    filename = f"Invoice_{guest_clean}.docx"
 
     mapping = {
         "DATE": datetime.today().strftime("%Y-%m-%d"),
         "INVOICE_NO": receipt_no,
-        "GUEST_NAME": record.get("Guest Name", ""),
-        "APARTMENT": record.get("Apartment Type", ""),
-        "UNIT_PRICE": record.get("Rate per Night", ""),
-        "DAYS": record.get("Number of Nights", ""),
-        "SUBTOTAL": f"{float(record.get('Rate per Night', 0)) * float(record.get('Number of Nights', 0)):.2f}",
-        "VAT": record.get("VAT", ""),
-        "TOTAL_DUE": record.get("Total Amount", "")
+        "GUEST_NAME": record.get("Guest Name") or "",
+        "APARTMENT": record.get("Apartment Type") or "",
+        "UNIT_PRICE": format_money(record.rate),
+        "DAYS": format_number(record.nights),
+        "SUBTOTAL": format_money(record.subtotal),
+        "VAT": format_money(record.vat),
+        "TOTAL_DUE": format_money(record.total)
     }
 
-    return fill_word_template(template_path, output_path, mapping)
+    return filename, render_word_template(template_path, receipt_no, mapping)
 
 
 def generate_word_receipt(receipt_no, record):
-    template_path = os.path.join(DATA_FOLDER, "receipt_template.docx")
-    guest_clean = sanitize_filename(record.get("Guest Name", "Guest"))
-    output_path = os.path.join(DATA_FOLDER, f"Receipt_{guest_clean}.docx")
+    template_path = RECEIPT_TEMPLATE
+    record = Reservation.of(record)
+    guest_clean = sanitize_filename(record.get("Guest Name") or "Guest")
+    filename = f"Receipt_{guest_clean}.docx"
 
     mapping = {
-        "GUEST_NAME": record.get("Guest Name", ""),
-        "CONTACT": record.get("Contact/Email", ""),
+        "GUEST_NAME": record.get("Guest Name") or "",
+        "CONTACT": record.get("Contact/Email") or "",
         "DATE": datetime.today().strftime("%Y-%m-%d"),
         "RECEIPT_NO": receipt_no,
         "BOOKING_REF": receipt_no,
-        "APARTMENT_TYPE": record.get("Apartment Type", ""),
-        "LOCATION": record.get("Place / Location", ""),
-        "CHECKIN": record.get("Check-In Date", ""),
-        "CHECKOUT": record.get("Check-Out Date", ""),
-        "NIGHTS": record.get("Number of Nights", ""),
-        "RATE": record.get("Rate per Night", ""),
-        "VAT": record.get("VAT", ""),
-        "TOTAL": record.get("Total Amount", ""),
-        "PAID": record.get("Amount Paid", ""),
-        "METHOD": record.get("Payment Method", ""),
-        "PAYMENT_DATE": record.get("Payment Date", ""),
-        "BALANCE": record.get("Balance", "")
+        "APARTMENT_TYPE": record.get("Apartment Type") or "",
+        "LOCATION": record.get("Place / Location") or "",
+        "CHECKIN": record.check_in_text,
+        "CHECKOUT": record.check_out_text,
+        "NIGHTS": format_number(record.nights),
+        "RATE": format_money(record.rate),
+        "VAT": format_money(record.vat),
+        "TOTAL": format_money(record.total),
+        "PAID": format_money(record.paid),
+        "METHOD": record.get("Payment Method") or "",
+        "PAYMENT_DATE": record.get("Payment Date") or "",
+        "BALANCE": format_money(record.balance)
     }
 
-    return fill_word_template(template_path, output_path, mapping)
+    return filename, render_word_template(template_path, receipt_no, mapping)
+
+
+def generate_customer_request(record):
+    guest_clean = sanitize_filename(record.get("Guest Name", "Guest"))
+    filename = f"CustomerRequest_{guest_clean}.docx"
+    from docx import Document
+    doc = Document()
+    doc.add_heading("Reservation Request", 0)
+    for key, value in record.items():
+        doc.add_paragraph(f"{key}: {value}")
+    doc.save(os.path.join(CUSTOMER_FOLDER, filename))
+    buf = io.BytesIO()
+    doc.save(buf)
+    return filename, buf.getvalue()
+
+# ---------------- BULK DOCUMENTS ----------------
+BULK_GENERATORS = {"receipts": "generate_word_receipt", "invoices": "generate_invoice"}
+_bulk_pool = None
+_bulk_pool_lock = threading.Lock()
+
+def filter_records(records, start=None, end=None, location=None, payment=None):
+    """Reservations whose check-in falls in [start, end] and match location/payment."""
+    for record in records:
+        check_in = iso_date(record.get("Check-In Date"))
+        if start and check_in < start:
+            continue
+        if end and check_in > end:
+            continue
+        if location and record.get("Place / Location") != location:
+            continue
+        if payment and record.get("Payment Method") != payment:
+            continue
+        yield record
+
+def render_bulk_document(kind, record):
+    # Runs in a worker process; looked up by name so it stays picklable.
+    return globals()[BULK_GENERATORS[kind]](record["Receipt No"], record)
+
+def bulk_pool():
+    global _bulk_pool
+    with _bulk_pool_lock:
+        if _bulk_pool is None:
+            # Spawned workers start from a fresh interpreter instead of a
+            # fork of this one, which may hold locks taken by other threads
+            # (the store writer, document jobs) at the moment of the fork.
+            _bulk_pool = ProcessPoolExecutor(max_workers=BULK_WORKERS,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return _bulk_pool
+
+
+class ZipStream:
+    """Write-only sink for zipfile that hands back what was written so far."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_bulk_zip(kind, records):
+    """Yield a ZIP of rendered documents chunk by chunk as each render finishes."""
+    stream = ZipStream()
+    errors = []
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as zf:
+        pool = bulk_pool()
+        pending = {}
+        records = iter(records)
+        while True:
+            for record in records:
+                pending[pool.submit(render_bulk_document, kind, record)] = record["Receipt No"]
+                if len(pending) >= BULK_WORKERS * 4:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                receipt_no = pending.pop(future)
+                try:
+                    filename, data = future.result()
+                except Exception as e:
+                    app.logger.exception("Bulk render failed for %s", receipt_no)
+                    errors.append(f"{receipt_no}: {e}")
+                    continue
+                zf.writestr(f"{sanitize_filename(str(receipt_no))}_{filename}", data)
+                yield stream.pop()
+        if errors:
+            zf.writestr("errors.txt", "\n".join(errors))
+    yield stream.pop()
+
+
+# ---------------- DOCUMENT JOBS ----------------
+class JobQueueFull(Exception):
+    pass
+
+
+class DocumentJobs:
+    """Background pool for document rendering, tracked by job id.
+
+    Each job is ``<id>.json`` (its status) plus ``<id>.bin`` (the rendered
+    document) in ``folder``, so any worker process can report on or serve
+    a job another one ran. Finished jobs are kept for ``ttl`` seconds and
+    at most ``limit`` jobs are kept at all, oldest finished dropped first.
+    Both are enforced by a sweep of the folder on the first enqueue and
+    every ``prune_every`` after it, so each process may overshoot ``limit``
+    by up to ``prune_every`` jobs between sweeps.
+
+    ``submit`` runs fire-and-forget work on the same pool without a job
+    file, for documents nobody polls for.
+    """
+
+    JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+    def __init__(self, workers, ttl, folder, limit, prune_every=1):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="document-job")
+        self.ttl = ttl
+        self.folder = folder
+        self.limit = limit
+        self.prune_every = prune_every
+        self.lock = threading.Lock()
+        self._enqueued = 0
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.folder, job_id + suffix)
+
+    def _save(self, job):
+        tmp = self._path(job["id"], f".{threading.get_ident()}.tmp")
+        with open(tmp, "w") as fh:
+            json.dump(job, fh)
+        os.replace(tmp, self._path(job["id"], ".json"))
+
+    def enqueue(self, kind, func, *args):
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "kind": kind, "status": "queued", "progress": 0.0,
+               "created": time.time(), "finished": None, "filename": None, "error": None}
+        with self.lock:
+            if self._enqueued % self.prune_every == 0:
+                with file_lock(os.path.join(self.folder, "jobs.lock")):
+                    self._prune()
+            self._enqueued += 1
+        self._save(job)
+        self.pool.submit(self._run, job, func, args)
+        return job_id
+
+    def submit(self, func, *args):
+        """Run ``func(*args)`` on the pool without tracking it as a job."""
+        return self.pool.submit(self._call, func, args)
+
+    @staticmethod
+    def _call(func, args):
+        try:
+            func(*args)
+        except Exception:
+            app.logger.exception("Background %s failed", func.__name__)
+
+    def _run(self, job, func, args):
+        job.update(status="running", progress=0.5)
+        self._save(job)
+        try:
+            job["filename"], data = func(*args)
+            with open(self._path(job["id"], ".bin"), "wb") as fh:
+                fh.write(data)
+            status = "done"
+        except Exception as e:
+            app.logger.exception("Document job %s failed", job["id"])
+            job["error"] = str(e)
+            status = "failed"
+        job.update(status=status, progress=1.0, finished=time.time())
+        self._save(job)
+
+    def _prune(self):
+        jobs = [job for job in map(self.get, (name[:-5] for name in os.listdir(self.folder)
+                                               if name.endswith(".json"))) if job]
+        cutoff = time.time() - self.ttl
+        finished = sorted((job for job in jobs if job["finished"]), key=lambda job: job["finished"])
+        expired = [job for job in finished if job["finished"] < cutoff]
+        drop = max(len(expired), len(jobs) - self.limit + 1)
+        if drop > len(finished):
+            raise JobQueueFull(f"{len(jobs) - len(finished)} document jobs already pending")
+        for job in finished[:drop]:
+            for suffix in (".json", ".bin"):
+                try:
+                    os.remove(self._path(job["id"], suffix))
+                except FileNotFoundError:
+                    pass
+
+    def get(self, job_id):
+        if not self.JOB_ID.fullmatch(job_id):
+            return None
+        try:
+            with open(self._path(job_id, ".json")) as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def data(self, job):
+        return self._path(job["id"], ".bin")
+
+    @staticmethod
+    def status(job):
+        info = {k: job[k] for k in ("id", "kind", "status", "progress", "error", "filename")}
+        if job["status"] == "done":
+            info["download_url"] = url_for("download_job", job_id=job["id"])
+        return info
+
+DOCUMENT_JOBS = DocumentJobs(DOCUMENT_WORKERS, JOB_TTL, JOB_FOLDER, JOB_LIMIT, JOB_PRUNE_EVERY)
+
+
+# ---------------- EXPORTS ----------------
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+def iter_export(fmt, headers, rows, chunk_rows=500):
+    """Serialise ``rows`` as CSV or NDJSON, yielding a few hundred rows at a time."""
+    buf = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buf)
+        writer.writerow(headers)
+        write = writer.writerow
+    else:
+        write = lambda row: buf.write(json.dumps(dict(zip(headers, row)), default=str) + "\n")
+    for i, row in enumerate(rows, start=1):
+        write(row)
+        if i % chunk_rows == 0:
+            yield buf.getvalue().encode()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode()
+
+def iter_gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class XlsxSnapshots:
+    """Versioned xlsx exports of the store, built in the background.
+
+    Each snapshot is written with openpyxl's write-only mode to a temporary
+    file and renamed into place under the store version it was built from,
+    so a download only ever opens a complete, unchanging file. Writes
+    schedule a rebuild ``debounce`` seconds later, so a burst of bookings
+    costs one build. A request is served the newest complete snapshot under
+    its own version; only when there is none yet (or with ``wait``) does it
+    wait for the build of the current version, which concurrent requests
+    share.
+    """
+
+    def __init__(self, store, folder, debounce=2.0, keep=3):
+        self.store = store
+        self.folder = folder
+        self.debounce = debounce
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(1, thread_name_prefix="xlsx-snapshot")
+        self.building = {}
+        self.leases = {}  # path -> requests between get() and opening the file
+        self.latest = None  # (version, path)
+        self._timer = None
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, version):
+        return os.path.join(self.folder, f"TamEcoVita_{version}.xlsx")
+
+    def schedule(self):
+        """Rebuild ``debounce`` seconds from now unless a rebuild is already due."""
+        with self.lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.debounce, self._scheduled)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _scheduled(self):
+        with self.lock:
+            self._timer = None
+            try:
+                self._start(self.store.version())
+            except Exception:
+                app.logger.exception("Scheduling the xlsx snapshot failed")
+
+    def _start(self, version):
+        # Caller holds self.lock.
+        if os.path.exists(self.path(version)):
+            return None
+        future = self.building.get(version)
+        if future is None:
+            version, headers, rows = self.store.snapshot()
+            future = self.building.setdefault(
+                version, self.pool.submit(self._build, version, headers, rows))
+        return future
+
+    def _newest_on_disk(self):
+        names = [n for n in os.listdir(self.folder) if n.startswith("TamEcoVita_") and n.endswith(".xlsx")]
+        if not names:
+            return None
+        name = max(names, key=lambda n: os.path.getmtime(os.path.join(self.folder, n)))
+        return name[len("TamEcoVita_"):-len(".xlsx")], os.path.join(self.folder, name)
+
+    def get(self, wait=False):
+        """(version, path) of the snapshot to serve; release(path) once it is open."""
+        version = self.store.version()
+        with self.lock:
+            if os.path.exists(self.path(version)):
+                # Built here, by an earlier run or by another worker.
+                self.latest = (version, self.path(version))
+            if self.latest and self.latest[0] == version:
+                return self._lease(self.latest)
+            future = self._start(version)
+            newest = self.latest or self._newest_on_disk()
+            if newest and not wait:
+                return self._lease(newest)
+        if future is not None:
+            future.result()
+        with self.lock:
+            return self._lease(self.latest)
+
+    def _lease(self, snapshot):
+        self.leases[snapshot[1]] = self.leases.get(snapshot[1], 0) + 1
+        return snapshot
+
+    def release(self, path):
+        with self.lock:
+            self.leases[path] -= 1
+            if not self.leases[path]:
+                del self.leases[path]
+
+    def _build(self, version, headers, rows):
+        path = self.path(version)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with timed_span("xlsx_snapshot"), open(tmp, "wb") as fh:
+                write_reservations_xlsx(fh, headers, rows)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            with self.lock:
+                self.building.pop(version, None)
+        with self.lock:
+            self.latest = (version, path)
+            self._prune()
+        return version, path
+
+    def _prune(self):
+        # Caller holds self.lock. Snapshots handed out but not yet opened
+        # are kept; once open, removing the name doesn't disturb the download.
+        names = [os.path.join(self.folder, n) for n in os.listdir(self.folder) if n.endswith(".xlsx")]
+        for old in sorted(names, key=os.path.getmtime)[:-self.keep]:
+            if old in self.leases or old == self.latest[1]:
+                continue
+            try:
+                os.remove(old)
+            except OSError:
+                pass  # still being downloaded on Windows; next prune gets it
+
+SNAPSHOTS = XlsxSnapshots(STORE, SNAPSHOT_FOLDER, debounce=SNAPSHOT_DEBOUNCE)
+STORE.listeners.append(SNAPSHOTS.schedule)
+
+
+# ---------------- IMPORT ----------------
+IMPORT_FIELDS = ("name", "email", "total_days", "date_coming", "date_going", "place",
+                 "apartment", "reservation_fee", "payment", "date", "amount_paid")
+
+def iter_import_rows(fh, filename):
+    """Yield (line number, {column: value}) for the non-blank rows of a CSV
+    or xlsx file, reading it as a stream.
+
+    Columns are named like the customer form's fields (see IMPORT_FIELDS).
+    """
+    if filename.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook
+        wb = load_workbook(fh, read_only=True, data_only=True)
+        try:
+            ws = wb["Reservations"] if "Reservations" in wb.sheetnames else wb.worksheets[0]
+            it = ws.iter_rows(values_only=True)
+            header = [str(h or "").strip() for h in next(it, ())]
+            for line, row in enumerate(it, start=2):
+                if any(v not in (None, "") for v in row):
+                    yield line, dict(zip(header, row))
+        finally:
+            wb.close()
+    else:
+        reader = csv.reader(io.TextIOWrapper(fh, encoding="utf-8-sig", newline=""))
+        header = [h.strip() for h in next(reader, [])]
+        for row in reader:
+            if any(v.strip() for v in row):
+                yield reader.line_num, dict(zip(header, row))
+
+def import_fields(raw):
+    """Customer-form fields for one imported row; ValueError says what is wrong with it."""
+    fields = {}
+    for key in IMPORT_FIELDS:
+        value = raw.get(key)
+        if isinstance(value, (datetime, date)):
+            value = value.strftime("%Y-%m-%d")
+        elif isinstance(value, float) and value.is_integer():
+            value = int(value)
+        fields[key] = "" if value is None else str(value).strip()
+    if not fields["name"]:
+        raise ValueError("name is required")
+    try:
+        start = date.fromisoformat(fields["date_coming"])
+        end = date.fromisoformat(fields["date_going"])
+    except ValueError:
+        raise ValueError("date_coming and date_going must be YYYY-MM-DD dates")
+    if end <= start:
+        raise ValueError("date_going must be after date_coming")
+    if not fields["total_days"]:
+        fields["total_days"] = str((end - start).days)
+    for key in ("total_days", "reservation_fee", "amount_paid"):
+        try:
+            number = float(fields[key] or 0)
+        except ValueError:
+            raise ValueError(f"{key} must be a number")
+        if number < 0:
+            raise ValueError(f"{key} must not be negative")
+    # The sheet's "2 bedroom" is accepted as well as the form's "2".
+    fields["apartment"] = re.sub(r"\s*bedroom$", "", fields["apartment"], flags=re.I)
+    return fields
+
+def import_reservations(rows):
+    """Validate (line, row) pairs and append the valid ones in a single write.
+
+    Returns (imported, errors): lists of {"row", "receipt_no"} and
+    {"row", "error"}. Invalid rows are reported and skipped.
+    """
+    accepted, errors = [], []
+    for line, raw in rows:
+        try:
+            accepted.append((line, reservation_values(import_fields(raw))))
+        except ValueError as e:
+            errors.append({"row": line, "error": str(e)})
+    with timed_span("import_write"):
+        outcomes = STORE.append_many([values for _, values in accepted],
+                                     reject_overlap=OVERBOOKING_POLICY == "reject")
+    imported = []
+    for (line, _), outcome in zip(accepted, outcomes):
+        if isinstance(outcome, OverbookingError):
+            errors.append({"row": line, "error": str(outcome)})
+        else:
+            imported.append({"row": line, "receipt_no": outcome})
+    errors.sort(key=lambda e: e["row"])
+    return imported, errors
+
 
 # ---------------- AUTH ----------------
+_password_hash = []
+
+def admin_password_hash():
+    # generate_password_hash is deliberately slow, so ADMIN_PASSWORD is
+    # hashed once per process, on the first login rather than at import.
+    if not _password_hash:
+        _password_hash.append(ADMIN_PASSWORD_HASH or
+                              generate_password_hash(os.environ.get("ADMIN_PASSWORD", "tamecovita1")))
+    return _password_hash[0]
+
 def logged_in():
     return session.get("logged_in") == True
 
+def bearer_ok(token):
+    """True if the request carries ``Authorization: Bearer <token>`` for a configured token."""
+    return bool(token) and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+
 @app.route("/login", methods=["GET","POST"])
 def login():
     if request.method == "POST":
-        if check_password_hash(ADMIN_PASSWORD_HASH, request.form.get("password","")):
+        if check_password_hash(admin_password_hash(), request.form.get("password","")):
             session["logged_in"] = True
             return redirect(url_for("index"))
         flash("Incorrect password.")
-    return render_template_string(login_template, SITE_NAME=SITE_NAME)
+    return render_template("login.html", SITE_NAME=SITE_NAME)
 
 @app.route("/logout")
 def logout():
@@ -352,91 +2800,87 @@ def logout():
     return redirect(url_for("login"))
 
 # ---------------- HOME ----------------
-@app.route("/home")
-@app.route("/home")
-def home():
-    home_template = f"""
-    <!doctype html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <title>{SITE_NAME} - Home</title>
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                background-color: #f5f7fa;
-                text-align: center;
-                margin: 0;
-                padding: 0;
-                display: flex;
-                flex-direction: column;
-                min-height: 100vh;
-            }}
-            main {{
-                flex: 1;
-            }}
-            .logo {{
-                margin-top: 50px;
-                width: 180px;
-            }}
-            h1 {{
-                color: #1b2a49;
-                margin-top: 20px;
-            }}
-            .btn {{
-                display: inline-block;
-                margin: 20px;
-                padding: 15px 30px;
-                background-color: #1b2a49;
-                color: white;
-                border-radius: 8px;
-                text-decoration: none;
-                font-weight: bold;
-            }}
-            .btn:hover {{
-                background-color: #304269;
-            }}
-            footer {{
-                background-color: #fff;
-                color: #333;
-                padding: 25px;
-                text-align: center;
-                box-shadow: 0 -2px 8px rgba(0,0,0,0.1);
-                font-size: 15px;
-                line-height: 1.6;
-            }}
-            footer a {{
-                color: #1b2a49;
-                text-decoration: none;
-            }}
-            footer a:hover {{
-                text-decoration: underline;
-            }}
-        </style>
-    </head>
-    <body>
-        <main>
-            <img src="/logo.png" class="logo">
-            <h1>Welcome to {SITE_NAME}</h1>
-            <a href="/customer" class="btn">Customer</a>
-            <a href="/login" class="btn">Admin</a>
-        </main>
-
-        <footer>
-            <strong>TAM Ecovista Properties</strong><br>
-            Tel: +2348117759059, +2348135567475<br>
-            RC: 7405900<br>
-            Address: 27B First Avenue, Gwarinpa, Abuja<br>
-            Website: <a href="https://tamecovista.com" target="_blank">tamecovista.com</a><br>
-            Email: <a href="mailto:info@tamecovista.com">info@tamecovista.com</a>
-        </footer>
-    </body>
-    </html>
-    """
-    return home_template
-
+home_template = """<!doctype html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>{{ SITE_NAME }} - Home</title>
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            background-color: #f5f7fa;
+            text-align: center;
+            margin: 0;
+            padding: 0;
+            display: flex;
+            flex-direction: column;
+            min-height: 100vh;
+        }
+        main {
+            flex: 1;
+        }
+        .logo {
+            margin-top: 50px;
+            width: 180px;
+        }
+        h1 {
+            color: #1b2a49;
+            margin-top: 20px;
+        }
+        .btn {
+            display: inline-block;
+            margin: 20px;
+            padding: 15px 30px;
+            background-color: #1b2a49;
+            color: white;
+            border-radius: 8px;
+            text-decoration: none;
+            font-weight: bold;
+        }
+        .btn:hover {
+            background-color: #304269;
+        }
+        footer {
+            background-color: #fff;
+            color: #333;
+            padding: 25px;
+            text-align: center;
+            box-shadow: 0 -2px 8px rgba(0,0,0,0.1);
+            font-size: 15px;
+            line-height: 1.6;
+        }
+        footer a {
+            color: #1b2a49;
+            text-decoration: none;
+        }
+        footer a:hover {
+            text-decoration: underline;
+        }
+    </style>
+</head>
+<body>
+    <main>
+        <img src="{{ logo_url(180) }}" srcset="{{ logo_url(360) }} 2x" class="logo">
+        <h1>Welcome to {{ SITE_NAME }}</h1>
+        <a href="/customer" class="btn">Customer</a>
+        <a href="/login" class="btn">Admin</a>
+    </main>
 
+    <footer>
+        <strong>TAM Ecovista Properties</strong><br>
+        Tel: +2348117759059, +2348135567475<br>
+        RC: 7405900<br>
+        Address: 27B First Avenue, Gwarinpa, Abuja<br>
+        Website: <a href="https://tamecovista.com" target="_blank">tamecovista.com</a><br>
+        Email: <a href="mailto:info@tamecovista.com">info@tamecovista.com</a>
+    </footer>
+</body>
+</html>
+"""
 
+@app.route("/home")
+def home():
+    return static_page("home.html")
 
 @app.route("/")
 def root_redirect():
@@ -510,7 +2954,7 @@ input[type="submit"]:hover {
 </style>
 
 <div class="container">
-<img src="/logo.png" class="logo" alt="Logo">
+<img src="{{ logo_url(150) }}" srcset="{{ logo_url(300) }} 2x" class="logo" alt="Logo">
 <h2>Reservation Request Form</h2>
 
 <form method="post" action="{{ url_for('submit') }}">
@@ -659,47 +3103,60 @@ input[type="submit"]:hover {
 </div>
 """
 
+# ---------------- TEMPLATE REGISTRY ----------------
+PAGE_TEMPLATES.update({
+    "login.html": login_template,
+    "index.html": index_template,
+    "edit.html": edit_template,
+    "search.html": search_template,
+    "home.html": home_template,
+    "customer.html": customer_template,
+})
+
+_static_pages = {}
+
+def static_page(name):
+    """Serve a page whose output never changes, rendered once per process.
+
+    Responses carry an ETag and Last-Modified so clients revalidate with a
+    cheap 304.
+    """
+    page = _static_pages.get(name)
+    if page is None:
+        body = render_template(name, SITE_NAME=SITE_NAME).encode()
+        page = _static_pages[name] = (body, hashlib.sha1(body).hexdigest())
+    resp = Response(page[0], mimetype="text/html")
+    resp.set_etag(page[1])
+    resp.last_modified = STARTED_AT
+    resp.cache_control.public = True
+    resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
+
 @app.route("/customer")
 def customer_form():
-    return render_template_string(customer_template)
+    if session.get("_flashes"):
+        return render_template("customer.html")
+    return static_page("customer.html")
 
 @app.route("/submit", methods=["POST"])
 def submit():
-    def parse_float(value):
-        try:
-            return float(value)
-        except (ValueError, TypeError):
-            return 0.0
-
-    name = request.form.get("name", "").strip()
-    email = request.form.get("email", "").strip()
-    date_coming = request.form.get("date_coming", "").strip()
-    date_going = request.form.get("date_going", "").strip()
-    place = request.form.get("place", "").strip()
-    apartment_type = request.form.get("apartment", "").strip()
-    payment_method = request.form.get("payment", "").strip()
-    payment_date = request.form.get("date", "").strip()
-    total_days = parse_float(request.form.get("total_days"))
-    reservation_fee = parse_float(request.form.get("reservation_fee"))
-    amount_paid = parse_float(request.form.get("amount_paid"))
-
-    apartment_type = f"{apartment_type} bedroom"
-    days_cost = reservation_fee * total_days
-    vat = days_cost * 0.075
-    total = days_cost + vat
-    balance = total - amount_paid
+    values = reservation_values(request.form)
+    (name, email, apartment_type, place, date_coming, date_going, total_days, reservation_fee,
+     vat, total, amount_paid, payment_method, payment_date, balance) = values
     date = datetime.today().strftime("%Y-%m-%d")
 
-    wb = load_workbook(FILENAME)
-    ws = wb["Reservations"]
-    receipt_no = next_id_code(ws)
-    ws.append([
-        receipt_no, name, email, apartment_type, place,
-        date_coming, date_going, total_days, reservation_fee,
-        vat, total, amount_paid, payment_method, payment_date, balance
-    ])
-    auto_adjust_columns(ws)
-    wb.save(FILENAME)
+    if OVERBOOKING_POLICY == "reject":
+        try:
+            receipt_no = STORE.append(values, reject_overlap=True)
+        except OverbookingError:
+            flash(f"Sorry, {apartment_type} at {place} is already booked for some of those nights.")
+            return redirect(url_for("customer_form"))
+    else:
+        conflicts = STORE.conflicts(place, apartment_type, date_coming, date_going)
+        receipt_no = STORE.append(values)
+        if conflicts:
+            app.logger.warning("Reservation %s overlaps %s", receipt_no, ", ".join(conflicts))
+            flash("Note: those dates overlap an existing booking; we will confirm availability with you.")
 
     record = {
         "Receipt No": receipt_no,
@@ -720,116 +3177,397 @@ def submit():
         "Balance": f"{balance:.2f}"
     }
 
-    guest_clean = sanitize_filename(name)
-    output_path = os.path.join(CUSTOMER_FOLDER, f"CustomerRequest_{guest_clean}.docx")
-    doc = Document()
-    doc.add_heading("Reservation Request", 0)
-    for key, value in record.items():
-        doc.add_paragraph(f"{key}: {value}")
-    doc.save(output_path)
+    # Nobody polls for the request copy, so it skips the job files and the
+    # JOB_LIMIT accounting that admin downloads rely on.
+    DOCUMENT_JOBS.submit(generate_customer_request, record)
 
     flash(f"Reservation submitted! Receipt No: {receipt_no}")
     return redirect(url_for("customer_form"))
 
+def encode_cursor(cursor, sort, order):
+    return base64.urlsafe_b64encode(json.dumps([sort, order, *cursor]).encode()).decode()
+
+def decode_cursor(token, sort, order):
+    """The (key, pos) cursor in ``token``, or None if it is malformed or was
+    issued for another sort or order, whose keys don't compare with these."""
+    if not token:
+        return None
+    try:
+        cursor_sort, cursor_order, key, pos = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (ValueError, TypeError):
+        return None
+    key = tuple(key) if isinstance(key, list) else key
+    sample = SORT_KEYS[sort]((None,) * len(HEADERS))
+    shape = lambda k: tuple(map(type, k)) if isinstance(k, tuple) else type(k)
+    if (cursor_sort, cursor_order) != (sort, order) or shape(key) != shape(sample) or type(pos) is not int:
+        return None
+    return key, pos
+
 @app.route("/index")
 def index():
     if not logged_in():
         return redirect(url_for("login"))
-    wb = load_workbook(FILENAME)
-    ws = wb["Reservations"]
-    rows = []
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        rows.append(dict(zip([c.value for c in ws[1]], row)))
-    return render_template_string(index_template, SITE_NAME=SITE_NAME, rows=rows)
+    sort = request.args.get("sort", "receipt")
+    if sort not in SORT_KEYS:
+        sort = "receipt"
+    order = "desc" if request.args.get("order") == "desc" else "asc"
+    size = min(max(request.args.get("size", DASHBOARD_PAGE_SIZE, type=int), 1), 500)
+    cursor = decode_cursor(request.args.get("cursor"), sort, order)
+    rows, next_cursor = STORE.page(sort, order == "desc", size, cursor)
+    return render_template("index.html", SITE_NAME=SITE_NAME, rows=rows, sort=sort, order=order,
+                           size=size, next_cursor=encode_cursor(next_cursor, sort, order) if next_cursor else None)
 
 @app.route("/edit/<receipt_no>")
 def edit(receipt_no):
     if not logged_in():
         return redirect(url_for("login"))
-    wb = load_workbook(FILENAME)
-    ws = wb["Reservations"]
-    record = None
-    headers = [c.value for c in ws[1]]
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        if row[0] == receipt_no:
-            record = dict(zip(headers, row))
-            break
+    record = STORE.find(receipt_no)
     if not record:
         return "Record not found", 404
-    return render_template_string(edit_template, record=record)
+    return render_template("edit.html", record=record)
 
 @app.route("/update/<receipt_no>", methods=["POST"])
 def update(receipt_no):
     if not logged_in():
         return redirect(url_for("login"))
-    wb = load_workbook(FILENAME)
-    ws = wb["Reservations"]
-    headers = [c.value for c in ws[1]]
-    updated = False
-    for idx, row in enumerate(ws.iter_rows(min_row=2), start=2):
-        if row[0].value == receipt_no:
-            for i, header in enumerate(headers):
-                val = request.form.get(header, "")
-                if row[i].data_type == 'n':
-                    try:
-                        row[i].value = float(val)
-                    except:
-                        row[i].value = val
-                else:
-                    row[i].value = val
-            updated = True
-            break
-    if updated:
-        wb.save(FILENAME)
+    if not STORE.update(receipt_no, request.form) and ARCHIVE.find(receipt_no):
+        return "Record is archived and read-only", 409
+    DOCUMENT_CACHE.invalidate(receipt_no)
     return redirect(url_for("index"))
 
 @app.route("/download")
 def download():
-    return send_from_directory(DATA_FOLDER, os.path.basename(FILENAME), as_attachment=True)
+    if not logged_in():
+        return redirect(url_for("login"))
+    # ?period=YYYY exports one year: its sealed partition if archived, plus
+    # any active reservations for that year (booked or edited since);
+    # ?period=all adds every archived year to the active reservations.
+    # Without it the newest prebuilt snapshot of the active reservations is
+    # served under its own version as ETag, with Range support; ?fresh=1
+    # waits for one of the current version.
+    period = request.args.get("period")
+    if not period:
+        version, path = SNAPSHOTS.get(wait=request.args.get("fresh") == "1")
+        try:
+            return send_file(path, as_attachment=True, download_name=os.path.basename(FILENAME),
+                             etag=version, conditional=True, max_age=0)
+        finally:
+            SNAPSHOTS.release(path)
+    if period == "all":
+        rows = [row for p in ARCHIVE.periods() for row in ARCHIVE.rows(p)[1]] + STORE.all()
+        name = "TamEcoVita_all.xlsx"
+    else:
+        if not re.fullmatch(r"\d{4}", period):
+            return "period must be a year (YYYY)", 400
+        rows = STORE.period_rows(period)
+        if period in ARCHIVE.periods():
+            if not rows:
+                return send_file(ARCHIVE.path(period), as_attachment=True)
+            rows = sorted(ARCHIVE.rows(period)[1] + rows, key=lambda row: receipt_sort_key(row[0]))
+        name = f"TamEcoVita_{period}.xlsx"
+    buf = io.BytesIO()
+    write_reservations_xlsx(buf, HEADERS, rows)
+    buf.seek(0)
+    return send_file(buf, as_attachment=True, download_name=name)
+
+@app.route("/export.<fmt>")
+def export(fmt):
+    """Stream reservations as CSV or NDJSON.
+
+    ?from= and ?to= limit the check-in dates (YYYY-MM-DD, inclusive);
+    ?gzip=1 compresses the stream into a .gz download.
+    """
+    if not logged_in():
+        return redirect(url_for("login"))
+    if fmt not in EXPORT_FORMATS:
+        return "Unknown export format", 404
+    check_in_from = request.args.get("from") or None
+    check_in_to = request.args.get("to") or None
+    for value in (check_in_from, check_in_to):
+        if value and not re.fullmatch(r"\d{4}-\d{2}-\d{2}", value):
+            return "from and to must be YYYY-MM-DD dates", 400
+    # Taken before the snapshot, so following /changes from here may repeat
+    # a reservation but never misses one.
+    cursor = STORE.changes.cursor()
+    version, headers, rows = STORE.snapshot(check_in_from, check_in_to)
+    chunks = iter_export(fmt, headers, rows)
+    name = f"TamEcoVita_reservations.{fmt}"
+    mimetype = EXPORT_FORMATS[fmt]
+    if request.args.get("gzip") == "1":
+        chunks, name, mimetype = iter_gzip(chunks), name + ".gz", "application/gzip"
+    return Response(chunks, mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename={name}",
+        "ETag": f'"{version}"',
+        "X-Changes-Cursor": str(cursor),
+    })
+
+@app.route("/import", methods=["POST"])
+def import_upload():
+    if not logged_in():
+        return redirect(url_for("login"))
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify(error="Upload a CSV or xlsx file as 'file'"), 400
+    try:
+        imported, errors = import_reservations(iter_import_rows(upload.stream, upload.filename))
+    except (csv.Error, UnicodeDecodeError, zipfile.BadZipFile, KeyError) as e:
+        return jsonify(error=f"Could not read {upload.filename}: {e}"), 400
+    return jsonify(imported=len(imported), receipts=[i["receipt_no"] for i in imported], errors=errors)
+
+@app.route("/changes")
+def changes():
+    """Reservations inserted or updated after ?since=<cursor>, oldest first.
+
+    Each reservation appears once, as it is now, at the position of its
+    latest change. A receipt number that went away (an edit gave the
+    reservation a new one) appears as ``{"op": "delete", "receipt_no"}``.
+    Without ``since`` only the current cursor is returned, to start
+    following after a full export.
+    """
+    if not (logged_in() or bearer_ok(CHANGES_TOKEN)):
+        return "Unauthorized", 401, {"WWW-Authenticate": "Bearer"}
+    since = request.args.get("since")
+    if since is None:
+        return jsonify(cursor=str(STORE.changes.cursor()), changes=[], more=False)
+    if not since.isdigit():
+        return jsonify(error="since must be a cursor returned by /changes"), 400
+    limit = min(request.args.get("limit", CHANGES_LIMIT, type=int), 5000)
+    entries, more = STORE.changes.since(int(since), max(limit, 1))
+    latest, first_op = {}, {}
+    for seq, op, receipt_no in entries:
+        first_op.setdefault(receipt_no, op)
+        latest.pop(receipt_no, None)
+        latest[receipt_no] = seq, op
+    feed = []
+    for receipt_no, (seq, op) in latest.items():
+        record = None if op == "delete" else STORE.find(receipt_no)
+        if record is not None:
+            op = "insert" if first_op[receipt_no] == "insert" else "update"
+            feed.append({"seq": seq, "op": op, "reservation": record.to_dict()})
+        elif op == "delete":
+            feed.append({"seq": seq, "op": "delete", "receipt_no": receipt_no})
+    cursor = entries[-1][0] if entries else int(since)
+    return jsonify(cursor=str(cursor), changes=feed, more=more)
 
 @app.route("/search")
 def search():
     if not logged_in():
         return redirect(url_for("login"))
-    query = request.args.get("q", "").lower()
-    wb = load_workbook(FILENAME)
-    ws = wb["Reservations"]
-    headers = [c.value for c in ws[1]]
-    rows = []
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        if query in str(row[1]).lower():
-            rows.append(dict(zip(headers, row)))
-    return render_template_string(search_template, rows=rows)
+    args = request.args
+    rows, total = STORE.search(
+        args.get("q", ""),
+        check_in_from=args.get("check_in_from"), check_in_to=args.get("check_in_to"),
+        check_out_from=args.get("check_out_from"), check_out_to=args.get("check_out_to"),
+        limit=SEARCH_LIMIT)
+    return render_template("search.html", rows=rows, total=total, args=args)
 
 @app.route("/receipt/<receipt_no>/word")
 def download_word_receipt(receipt_no):
-    wb = load_workbook(FILENAME)
-    ws = wb["Reservations"]
-    headers = [c.value for c in ws[1]]
-    record = None
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        if row[0] == receipt_no:
-            record = dict(zip(headers, row))
-            break
+    record = STORE.find(receipt_no)
     if not record:
         return "Receipt not found", 404
-    filepath = generate_word_receipt(receipt_no, record)
-    return send_from_directory(DATA_FOLDER, os.path.basename(filepath), as_attachment=True)
+    filename, data = generate_word_receipt(receipt_no, record)
+    return send_file(io.BytesIO(data), as_attachment=True, download_name=filename)
 
 @app.route("/invoice/<receipt_no>/download")
 def download_invoice(receipt_no):
-    wb = load_workbook(FILENAME)
-    ws = wb["Reservations"]
-    headers = [c.value for c in ws[1]]
-    record = None
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        if row[0] == receipt_no:
-            record = dict(zip(headers, row))
-            break
+    record = STORE.find(receipt_no)
     if not record:
         return "Invoice not found", 404
-    filepath = generate_invoice(receipt_no, record)
-    return send_from_directory(DATA_FOLDER, os.path.basename(filepath), as_attachment=True)
+    filename, data = generate_invoice(receipt_no, record)
+    return send_file(io.BytesIO(data), as_attachment=True, download_name=filename)
+
+@app.route("/availability")
+def availability():
+    if not logged_in():
+        return redirect(url_for("login"))
+    check_in = request.args.get("start", "")
+    check_out = request.args.get("end", "")
+    try:
+        units = STORE.availability_for(check_in, check_out,
+                                       location=request.args.get("location"),
+                                       apartment_type=request.args.get("apartment"))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(start=check_in, end=check_out, units=units)
+
+@app.route("/reports")
+def reports():
+    if not logged_in():
+        return redirect(url_for("login"))
+    dims = request.args.getlist("by") or ["month"]
+    unknown = [dim for dim in dims if dim not in REPORT_DIMENSIONS]
+    if unknown:
+        return jsonify(error=f"Unknown report dimension: {', '.join(unknown)}",
+                       dimensions=sorted(REPORT_DIMENSIONS)), 400
+    return jsonify({dim: STORE.report(dim) for dim in dims})
+
+@app.route("/bulk/<kind>")
+def bulk_documents(kind):
+    if not logged_in():
+        return redirect(url_for("login"))
+    if kind not in BULK_GENERATORS:
+        return "Unknown document kind", 404
+    records = list(filter_records(
+        STORE.records(),
+        start=request.args.get("start"), end=request.args.get("end"),
+        location=request.args.get("location"), payment=request.args.get("payment")))
+    filename = f"{kind}_{datetime.today().strftime('%Y-%m-%d')}.zip"
+    return Response(iter_bulk_zip(kind, records), mimetype="application/zip",
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+@app.route("/jobs/<kind>/<receipt_no>", methods=["POST"])
+def enqueue_document_job(kind, receipt_no):
+    if not logged_in():
+        return redirect(url_for("login"))
+    generators = {"receipt": generate_word_receipt, "invoice": generate_invoice}
+    if kind not in generators:
+        return jsonify(error="Unknown document kind"), 404
+    record = STORE.find(receipt_no)
+    if not record:
+        return jsonify(error="Reservation not found"), 404
+    try:
+        job_id = DOCUMENT_JOBS.enqueue(kind, generators[kind], receipt_no, record)
+    except JobQueueFull as e:
+        return jsonify(error=str(e)), 503, {"Retry-After": "5"}
+    return jsonify(job_id=job_id, status_url=url_for("job_status", job_id=job_id)), 202
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    if not logged_in():
+        return redirect(url_for("login"))
+    job = DOCUMENT_JOBS.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown job"), 404
+    return jsonify(DocumentJobs.status(job))
+
+@app.route("/jobs/<job_id>/download")
+def download_job(job_id):
+    if not logged_in():
+        return redirect(url_for("login"))
+    job = DOCUMENT_JOBS.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown job"), 404
+    if job["status"] != "done":
+        return jsonify(DocumentJobs.status(job)), 409
+    return send_file(DOCUMENT_JOBS.data(job), as_attachment=True, download_name=job["filename"])
+
+@app.route("/metrics")
+def metrics():
+    if not (logged_in() or bearer_ok(METRICS_TOKEN)):
+        return "Unauthorized", 401, {"WWW-Authenticate": "Bearer"}
+    stats = STORE.stats()
+    path = getattr(STORE.backend, "path", None)
+    gauges = [
+        ("tecovita_reservations", stats["rows"]),
+        ("tecovita_storage_bytes", os.path.getsize(path) if path and os.path.exists(path) else 0),
+        ("tecovita_journal_entries", stats["journal_entries"]),
+        ("tecovita_startup_seconds", STARTUP_REPORT.get("total_s", STARTUP_REPORT["import_s"])),
+    ]
+    return Response(METRICS.render(METRICS_HELP, gauges), mimetype="text/plain; version=0.0.4")
+
+@app.route("/store/stats")
+def store_stats():
+    if not logged_in():
+        return redirect(url_for("login"))
+    return jsonify(dict(STORE.stats(), documents=DOCUMENT_CACHE.stats(), startup=STARTUP_REPORT))
+
+@app.cli.command("migrate-sqlite")
+def migrate_sqlite_command():
+    """Copy the Reservations sheet into the SQLite database."""
+    if STORAGE_BACKEND != "xlsx":
+        raise click.ClickException("Run the migration with STORAGE_BACKEND=xlsx")
+    # Nothing has opened the workbook in this process yet, so compact() would
+    # skip it; fold the journal in directly so no booking is left behind.
+    with STORE.lock, file_lock(STORE.lock_path):
+        STORE._compact()
+    backend = SqliteBackend(DATABASE)
+    try:
+        count = migrate_xlsx_to_sqlite(FILENAME, backend)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Migrated {count} reservations into {DATABASE}")
+
+@app.cli.command("archive")
+@click.option("--before", type=int, default=lambda: date.today().year,
+              help="Archive reservations checking in before this year (default: the current year).")
+def archive_command(before):
+    """Move past years of reservations into sealed, read-only partitions."""
+    moved = STORE.archive_before(f"{before:04d}-01-01")
+    if not moved:
+        click.echo(f"Nothing checks in before {before}")
+    for period, count in sorted(moved.items()):
+        click.echo(f"Archived {count} reservations into {ARCHIVE.path(period)}")
+
+@app.cli.command("import-reservations")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+def import_reservations_command(path):
+    """Import bookings from a CSV or xlsx file in one batch."""
+    with open(path, "rb") as fh:
+        imported, errors = import_reservations(iter_import_rows(fh, path))
+    for error in errors:
+        click.echo(f"Row {error['row']}: {error['error']}")
+    if imported:
+        click.echo(f"Imported {len(imported)} reservations "
+                   f"({imported[0]['receipt_no']} to {imported[-1]['receipt_no']})")
+    else:
+        click.echo("Nothing imported")
+
+@app.cli.command("bulk-documents")
+@click.argument("kind", type=click.Choice(sorted(BULK_GENERATORS)))
+@click.option("--start", help="Earliest check-in date (YYYY-MM-DD).")
+@click.option("--end", help="Latest check-in date (YYYY-MM-DD).")
+@click.option("--location", help="Place / Location to match.")
+@click.option("--payment", help="Payment method to match.")
+@click.option("--output", "-o", type=click.Path(dir_okay=False), required=True)
+def bulk_documents_command(kind, start, end, location, payment, output):
+    """Render matching receipts or invoices into a ZIP file."""
+    records = list(filter_records(STORE.records(), start, end, location, payment))
+    with open(output, "wb") as fh:
+        for chunk in iter_bulk_zip(kind, records):
+            fh.write(chunk)
+    click.echo(f"Wrote {len(records)} {kind} to {output}")
+
+# ---------------- APP FACTORY ----------------
+STARTUP_REPORT = {}
+_startup_lock = threading.Lock()
+
+def create_app(warm=WARM_START):
+    """Return the app, optionally warmed up, and record how long startup took.
+
+    Importing main only defines things: storage is opened, the logo
+    variants built, the admin password hashed and the Word templates
+    compiled when first needed. With
+    ``warm`` (WARM_START=1) that work is done here instead, so a new worker
+    pays for it before taking traffic (``gunicorn 'main:create_app()'``).
+    ``main:app`` still works and warms up lazily.
+    """
+    with _startup_lock:
+        if "total_s" in STARTUP_REPORT:
+            return app
+        phases = {}
+        if warm:
+            steps = (
+                ("storage", STORE.all),
+                ("logo", get_logo),
+                ("password_hash", admin_password_hash),
+                ("templates", lambda: [app.jinja_env.get_template(name) for name in PAGE_TEMPLATES]),
+                ("docx_templates", precompile_docx_templates),
+                ("snapshot", SNAPSHOTS.schedule),
+            )
+            for phase, step in steps:
+                start = time.perf_counter()
+                step()
+                phases[phase] = round(time.perf_counter() - start, 4)
+        total = time.perf_counter() - IMPORT_STARTED
+        STARTUP_REPORT.update(phases=phases, total_s=round(total, 4), target_s=STARTUP_TARGET,
+                              within_target=total <= STARTUP_TARGET)
+        log = app.logger.info if total <= STARTUP_TARGET else app.logger.warning
+        log("Started in %.3fs (import %.3fs, %s; target %.1fs)", total, STARTUP_REPORT["import_s"],
+            ", ".join(f"{k} {v:.3f}s" for k, v in phases.items()) or "nothing warmed", STARTUP_TARGET)
+    return app
+
+STARTUP_REPORT["import_s"] = round(time.perf_counter() - IMPORT_STARTED, 4)
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    create_app().run(host="0.0.0.0", port=5000, debug=True)
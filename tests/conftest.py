@@ -0,0 +1,75 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main keeps its data under <cwd>/instance, fixed when it is imported, so it
+# is imported from a scratch directory and the working directory restored.
+SCRATCH = tempfile.mkdtemp()
+_cwd = os.getcwd()
+os.chdir(SCRATCH)
+try:
+    import main
+finally:
+    os.chdir(_cwd)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+
+
+def reservation(i, check_in="2025-01-10", check_out="2025-01-12", location="Wuse", apartment="2 bedroom"):
+    """Store values (everything after Receipt No) for a made-up booking."""
+    return [f"Guest {i}", f"g{i}@example.com", apartment, location, check_in, check_out,
+            2, 100.0, 15.0, 215.0, 50.0, "Cash", "2025-01-01", 165.0]
+
+
+@pytest.fixture
+def values():
+    return reservation
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    """Factory for stores over one workbook, journal and counter in ``tmp_path``.
+
+    Every store it returns shares the same files, like worker processes do.
+    """
+    def make(rows=None, journal=None):
+        path = str(tmp_path / "host.xlsx")
+        if rows is not None and not os.path.exists(path):
+            with open(path, "wb") as fh:
+                main.write_reservations_xlsx(fh, main.HEADERS, rows)
+        return main.ReservationStore(
+            main.XlsxBackend(path), journal or str(tmp_path / "journal.jsonl"),
+            archive=main.ReservationArchive(str(tmp_path / "archive")),
+            counter=main.ReceiptCounter(str(tmp_path / "counter")),
+            changes=main.ChangeLog(str(tmp_path / "changes.jsonl")),
+            compact_interval=3600, commit_window=0.001)
+    return make
+
+
+@pytest.fixture
+def store(make_store, monkeypatch, tmp_path):
+    """A fresh store installed as main.STORE, with its archive and snapshots."""
+    store = make_store()
+    snapshots = main.XlsxSnapshots(store, str(tmp_path / "snapshots"), debounce=0.05)
+    store.listeners.append(snapshots.schedule)
+    monkeypatch.setattr(main, "STORE", store)
+    monkeypatch.setattr(main, "ARCHIVE", store.archive)
+    monkeypatch.setattr(main, "SNAPSHOTS", snapshots)
+    return store
+
+
+@pytest.fixture
+def client(store):
+    """Logged-in test client over ``store``."""
+    main.app.config["TESTING"] = True
+    client = main.app.test_client()
+    with client.session_transaction() as session:
+        session["logged_in"] = True
+    return client
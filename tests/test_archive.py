@@ -0,0 +1,57 @@
+import io
+
+import openpyxl
+import pytest
+
+import main
+
+
+def receipts(data):
+    ws = openpyxl.load_workbook(io.BytesIO(data))["Reservations"]
+    return [row[0] for row in ws.iter_rows(min_row=2, values_only=True)]
+
+
+@pytest.fixture
+def archived(store, values):
+    """Two 2023 and one 2024 booking archived, one 2025 booking left active."""
+    for i, check_in in enumerate(["2023-05-01", "2024-02-01", "2023-07-01", "2025-01-10"]):
+        store.append(values(i, check_in, check_in[:-2] + "03"))
+    assert store.archive_before("2025-01-01") == {"2023": 2, "2024": 1}
+    return store
+
+
+def test_archived_rows_leave_the_store_but_can_still_be_found(archived):
+    assert [row[1] for row in archived.all()] == ["Guest 3"]
+    assert archived.archive.periods() == ["2023", "2024"]
+    assert archived.find("TEC-0001")["Guest Name"] == "Guest 0"
+
+
+def test_receipt_numbers_are_not_reused_after_archiving(archived, values):
+    assert archived.append(values(9)) == main.next_id_code(4)
+
+
+def test_reports_include_archived_years(archived, client):
+    by_month = {row["key"]: row["reservations"] for row in client.get("/reports?by=month").get_json()["month"]}
+    assert by_month == {"2023-05": 1, "2023-07": 1, "2024-02": 1, "2025-01": 1}
+    [wuse] = archived.report("location")
+    assert (wuse["key"], wuse["reservations"], wuse["revenue"]) == ("Wuse", 4, 860.0)
+
+
+def test_period_download_merges_later_bookings_into_the_archived_year(archived, values, client):
+    assert receipts(client.get("/download?period=2023").data) == ["TEC-0001", "TEC-0003"]
+    late = archived.append(values(9, "2023-12-20", "2023-12-22"))
+    assert receipts(client.get("/download?period=2023").data) == ["TEC-0001", "TEC-0003", late]
+    assert receipts(client.get("/download?period=2025").data) == ["TEC-0004"]
+
+
+def test_all_periods_download_adds_every_archived_year(archived, client):
+    assert sorted(receipts(client.get("/download?period=all").data)) == [
+        "TEC-0001", "TEC-0002", "TEC-0003", "TEC-0004"]
+    assert client.get("/download?period=23").status_code == 400
+
+
+def test_archived_reservations_are_read_only(archived, client):
+    record = archived.find("TEC-0002")
+    r = client.post("/update/TEC-0002", data=dict(record.items(), **{"Guest Name": "Ada Eze"}))
+    assert r.status_code == 409
+    assert archived.find("TEC-0002")["Guest Name"] == "Guest 1"
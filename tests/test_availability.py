@@ -0,0 +1,25 @@
+import pytest
+
+
+def test_unit_is_unavailable_for_overlapping_nights(client, store, values):
+    store.append(values(1, "2025-01-10", "2025-01-12"))
+    store.append(values(2, "2025-01-10", "2025-01-12", apartment="3 bedroom"))
+
+    units = client.get("/availability?start=2025-01-11&end=2025-01-13&apartment=2 bedroom").get_json()["units"]
+    assert units == [{"location": "Wuse", "apartment_type": "2 bedroom",
+                      "available": False, "conflicts": ["TEC-0001"]}]
+
+
+@pytest.mark.parametrize("start, end", [("2025-01-08", "2025-01-10"), ("2025-01-12", "2025-01-14")])
+def test_stays_that_only_touch_do_not_conflict(client, store, values, start, end):
+    store.append(values(1, "2025-01-10", "2025-01-12"))
+    units = client.get(f"/availability?start={start}&end={end}").get_json()["units"]
+    assert [unit["available"] for unit in units] == [True]
+
+
+@pytest.mark.parametrize("start, end", [("2025-01-05", "2025-01-01"), ("2025-01-05", "2025-01-05"),
+                                        ("2025-01-05", ""), ("soon", "2025-01-06")])
+def test_bad_ranges_are_rejected(client, store, start, end):
+    r = client.get(f"/availability?start={start}&end={end}")
+    assert r.status_code == 400
+    assert "error" in r.get_json()
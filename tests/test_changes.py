@@ -0,0 +1,64 @@
+import main
+
+
+def feed(client, since, **params):
+    query = "".join(f"&{k}={v}" for k, v in params.items())
+    return client.get(f"/changes?since={since}{query}").get_json()
+
+
+def summary(changes):
+    return [(c["op"], c.get("receipt_no") or c["reservation"]["Receipt No"]) for c in changes]
+
+
+def test_cursor_without_since_skips_history(client, store, values):
+    store.append(values(1))
+    body = client.get("/changes").get_json()
+    assert body["changes"] == [] and feed(client, body["cursor"])["changes"] == []
+
+
+def test_each_reservation_appears_once_as_it_is_now(client, store, values):
+    cursor = client.get("/changes").get_json()["cursor"]
+    first = store.append(values(1))
+    second = store.append(values(2))
+    store.update(first, dict(store.find(first).items(), **{"Guest Name": "Ada Eze"}))
+
+    body = feed(client, cursor)
+    assert summary(body["changes"]) == [("insert", second), ("insert", first)]
+    assert body["changes"][1]["reservation"]["Guest Name"] == "Ada Eze"
+
+    store.update(second, dict(store.find(second).items(), **{"Guest Name": "Bola Ade"}))
+    assert summary(feed(client, body["cursor"])["changes"]) == [("update", second)]
+
+
+def test_renumbering_retires_the_old_receipt(client, store, values):
+    old = store.append(values(1))
+    cursor = client.get("/changes").get_json()["cursor"]
+    store.update(old, dict(store.find(old).items(), **{"Receipt No": "TEC-0100"}))
+
+    assert summary(feed(client, cursor)["changes"]) == [("delete", old), ("insert", "TEC-0100")]
+    assert store.find(old) is None
+
+
+def test_limit_pages_through_the_feed(client, store, values):
+    cursor = client.get("/changes").get_json()["cursor"]
+    receipts = [store.append(values(i)) for i in range(5)]
+    seen = []
+    while True:
+        body = feed(client, cursor, limit=2)
+        seen += summary(body["changes"])
+        cursor = body["cursor"]
+        if not body["more"]:
+            break
+    assert seen == [("insert", receipt) for receipt in receipts]
+
+
+def test_feed_needs_a_login_or_the_token(store, monkeypatch):
+    anon = main.app.test_client()
+    assert anon.get("/changes").status_code == 401
+    monkeypatch.setattr(main, "CHANGES_TOKEN", "s3cret")
+    assert anon.get("/changes", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+    assert anon.get("/changes", headers={"Authorization": "Bearer nope"}).status_code == 401
+
+
+def test_since_must_be_a_cursor(client):
+    assert client.get("/changes?since=abc").status_code == 400
@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize("existing", [0, 42])
+def test_counter_is_seeded_from_existing_sheet(make_store, values, existing):
+    rows = [[main.next_id_code(i)] + values(i) for i in range(existing)]
+    store = make_store(rows)
+
+    assert store.counter.peek() is None
+    assert store.append(values(100)) == main.next_id_code(existing)
+    assert store.counter.peek() == existing + 1
+    # Numbers keep coming from the counter, not from the rows on disk.
+    assert make_store().append(values(101)) == main.next_id_code(existing + 1)
+
+
+def test_counters_sharing_a_file_hand_out_disjoint_blocks(tmp_path):
+    path = str(tmp_path / "counter")
+    counters = [main.ReceiptCounter(path, block=5) for _ in range(3)]
+    taken = []
+    lock = threading.Lock()
+
+    def take(counter):
+        for _ in range(20):
+            number = counter.take()
+            with lock:
+                taken.append(number)
+
+    threads = [threading.Thread(target=take, args=(counter,)) for counter in counters]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(set(taken)) == 60
+    assert main.ReceiptCounter(path).take() >= max(taken) + 1
@@ -0,0 +1,60 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+import main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = main.DocumentCache(1000)
+    monkeypatch.setattr(main, "DOCUMENT_CACHE", cache)
+    monkeypatch.setattr(main, "INVOICE_TEMPLATE", os.path.join(ROOT, "invoice_template.docx"))
+    return cache
+
+
+def text(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return zf.read("word/document.xml").decode()
+
+
+def test_least_recently_used_documents_go_first(cache):
+    cache.put("a", "TEC-0001", b"x" * 400)
+    cache.put("b", "TEC-0002", b"x" * 400)
+    assert cache.get("a")
+    cache.put("c", "TEC-0003", b"x" * 400)
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.stats()["evictions"] == 1 and cache.size == 800
+
+
+def test_invalidate_drops_every_document_for_a_receipt(cache):
+    cache.put("a", "TEC-0001", b"receipt")
+    cache.put("b", "TEC-0001", b"invoice")
+    cache.put("c", "TEC-0002", b"invoice")
+    cache.invalidate("TEC-0001")
+    assert cache.get("a") is None and cache.get("b") is None
+    assert cache.get("c") == b"invoice" and cache.size == len(b"invoice")
+
+
+def test_repeat_downloads_are_served_from_the_cache(client, store, values, cache):
+    cache.max_bytes = 10 * 1024 * 1024
+    receipt = store.append(values(1))
+    first = client.get(f"/invoice/{receipt}/download").data
+    assert client.get(f"/invoice/{receipt}/download").data == first
+    assert (cache.stats()["hits"], cache.stats()["entries"]) == (1, 1)
+
+
+def test_editing_a_reservation_drops_its_cached_documents(client, store, values, cache):
+    cache.max_bytes = 10 * 1024 * 1024
+    receipt = store.append(values(1))
+    assert "Guest 1" in text(client.get(f"/invoice/{receipt}/download").data)
+
+    client.post(f"/update/{receipt}", data=dict(store.find(receipt).items(), **{"Guest Name": "Ada Eze"}))
+    assert cache.stats()["entries"] == 0
+    data = client.get(f"/invoice/{receipt}/download").data
+    assert "Ada Eze" in text(data) and "Guest 1" not in text(data)
@@ -0,0 +1,85 @@
+import io
+
+import openpyxl
+import pytest
+
+import main
+
+HEADER = "name,email,date_coming,date_going,place,apartment,reservation_fee,payment,date,amount_paid"
+
+
+def upload(client, data, filename="bookings.csv"):
+    return client.post("/import", data={"file": (io.BytesIO(data), filename)},
+                       content_type="multipart/form-data")
+
+
+def csv_file(*rows):
+    return "\n".join((HEADER,) + rows).encode()
+
+
+@pytest.mark.parametrize("row, error", [
+    (",a@example.com,2025-01-10,2025-01-12,Wuse,2,100,Cash,2025-01-01,0", "name is required"),
+    ("Ada,a@example.com,10/01/2025,2025-01-12,Wuse,2,100,Cash,2025-01-01,0", "must be YYYY-MM-DD dates"),
+    ("Ada,a@example.com,2025-01-12,2025-01-12,Wuse,2,100,Cash,2025-01-01,0", "date_going must be after"),
+    ("Ada,a@example.com,2025-01-10,2025-01-12,Wuse,2,lots,Cash,2025-01-01,0", "reservation_fee must be a number"),
+    ("Ada,a@example.com,2025-01-10,2025-01-12,Wuse,2,100,Cash,2025-01-01,-5", "amount_paid must not be negative"),
+])
+def test_invalid_rows_are_reported_and_skipped(client, store, row, error):
+    body = upload(client, csv_file("Bola,b@example.com,2025-02-01,2025-02-03,Wuse,3 bedroom,100,Cash,2025-01-01,0",
+                                   row)).get_json()
+    assert body["imported"] == 1 and len(store.all()) == 1
+    assert [e["row"] for e in body["errors"]] == [3]
+    assert error in body["errors"][0]["error"]
+
+
+def test_xlsx_rows_are_imported_in_one_batch(client, store):
+    wb = openpyxl.Workbook()
+    wb.active.append(HEADER.split(","))
+    for i in range(3):
+        wb.active.append([f"Guest {i}", "g@example.com", f"2025-0{i + 1}-10", f"2025-0{i + 1}-12",
+                          "Wuse", "2 bedroom", 100, "Cash", "2025-01-01", 50])
+    buf = io.BytesIO()
+    wb.save(buf)
+
+    body = upload(client, buf.getvalue(), "bookings.xlsx").get_json()
+    assert body["imported"] == 3 and body["errors"] == []
+    assert [row[1] for row in store.all()] == ["Guest 0", "Guest 1", "Guest 2"]
+    assert store.find(body["receipts"][0])["Apartment Type"] == "2 bedroom"
+
+
+def test_overlaps_are_rejected_per_row_under_the_reject_policy(client, store, values, monkeypatch):
+    monkeypatch.setattr(main, "OVERBOOKING_POLICY", "reject")
+    booked = store.append(values(0, "2025-02-01", "2025-02-05"))
+    body = upload(client, csv_file("Ada,a@example.com,2025-02-03,2025-02-04,Wuse,2,100,Cash,2025-01-01,0",
+                                   "Bola,b@example.com,2025-03-01,2025-03-03,Wuse,2,100,Cash,2025-01-01,0")).get_json()
+    assert body["imported"] == 1
+    assert body["errors"][0]["row"] == 2 and booked in body["errors"][0]["error"]
+
+
+@pytest.mark.parametrize("data, filename", [(None, ""), (b"not a workbook", "bookings.xlsx")])
+def test_unreadable_uploads_are_a_bad_request(client, store, data, filename):
+    r = client.post("/import", data={} if data is None else {"file": (io.BytesIO(data), filename)},
+                    content_type="multipart/form-data")
+    assert r.status_code == 400 and "error" in r.get_json()
+    assert store.all() == []
+
+
+def test_rejecting_overlaps_reserves_numbers_once(make_store, values, monkeypatch):
+    store = make_store()
+    booked = store.append(values(0, "2025-02-01", "2025-02-05"))
+    takes = []
+    take = store.counter.take
+    monkeypatch.setattr(store.counter, "take", lambda *a, **kw: takes.append(a) or take(*a, **kw))
+
+    outcome = store.append_many([
+        values(1, "2025-02-03", "2025-02-04"),  # overlaps the stored booking
+        values(2, "2025-03-01", "2025-03-03"),
+        values(3, "2025-03-02", "2025-03-04"),  # overlaps row 2 of this batch
+        values(4, "2025-04-01", "2025-04-03"),
+    ], reject_overlap=True)
+
+    assert len(takes) == 1
+    assert outcome[1] == main.next_id_code(1) and outcome[3] == main.next_id_code(2)
+    assert isinstance(outcome[0], main.OverbookingError) and outcome[0].conflicts == [booked]
+    assert isinstance(outcome[2], main.OverbookingError) and outcome[2].conflicts == [outcome[1]]
+    assert len(store.all()) == 3
@@ -0,0 +1,42 @@
+import os
+import threading
+import time
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    jobs = main.DocumentJobs(2, 3600, str(tmp_path), limit=1, prune_every=2)
+    yield jobs
+    jobs.pool.shutdown(wait=True)
+
+
+def job_files(jobs):
+    return sorted(name for name in os.listdir(jobs.folder) if name.endswith(".json"))
+
+
+def test_untracked_work_leaves_no_job_files(jobs):
+    jobs.submit(lambda: None).result(timeout=5)
+    jobs.submit(lambda: 1 / 0).result(timeout=5)  # logged, not raised
+    assert job_files(jobs) == []
+
+
+def test_limit_is_enforced_at_each_sweep(jobs):
+    release = threading.Event()
+    render = lambda: (release.wait(5), ("doc.docx", b"PK"))[1]
+    first = jobs.enqueue("receipt", render)
+    jobs.enqueue("receipt", render)  # no sweep on this one
+    with pytest.raises(main.JobQueueFull):
+        jobs.enqueue("receipt", render)
+    assert len(job_files(jobs)) == 2
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while any(jobs.get(name[:-5])["status"] != "done" for name in job_files(jobs)):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    jobs.enqueue("receipt", render)  # the sweep drops the oldest finished jobs
+    assert first + ".json" not in job_files(jobs)
@@ -0,0 +1,59 @@
+import re
+
+import pytest
+
+import main
+
+
+def pages(client, **params):
+    """Receipt numbers on each page, following next-page links to the end."""
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    found, url = [], f"/index?{query}"
+    while url:
+        html = client.get(url).get_data(as_text=True)
+        found.append(re.findall(r"<td>(TEC-\d+)</td>", html))
+        link = re.search(r'href="([^"]*cursor=[^"]*)"', html)
+        url = link.group(1).replace("&amp;", "&") if link else None
+    return found
+
+
+@pytest.fixture
+def booked(store, values):
+    # Balances and check-ins deliberately out of receipt order.
+    for i in range(7):
+        row = values(i, check_in=f"2025-03-{20 - i:02d}", check_out=f"2025-03-{21 - i:02d}", location=f"Unit {i}")
+        row[13] = float((i * 37) % 11)
+        store.append(row)
+    return store
+
+
+@pytest.mark.parametrize("sort", ["receipt", "check_in", "balance"])
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_pages_cover_every_row_once_in_order(client, booked, sort, order):
+    got = pages(client, sort=sort, order=order, size=3)
+    assert [len(page) for page in got] == [3, 3, 1]
+    rows = {row[0]: row for row in booked.all()}
+    expected = sorted(rows, key=lambda r: (main.SORT_KEYS[sort](rows[r]), booked.index[r]), reverse=order == "desc")
+    assert [r for page in got for r in page] == expected
+
+
+@pytest.mark.parametrize("issued, used", [
+    (("check_in", "asc"), ("balance", "asc")),
+    (("check_in", "asc"), ("receipt", "asc")),
+    (("balance", "desc"), ("check_in", "desc")),
+    (("receipt", "asc"), ("receipt", "desc")),
+])
+def test_cursor_from_another_sort_starts_over(client, booked, issued, used):
+    html = client.get(f"/index?sort={issued[0]}&order={issued[1]}&size=3").get_data(as_text=True)
+    cursor = re.search(r"cursor=([^\"&]+)", html).group(1)
+    r = client.get(f"/index?sort={used[0]}&order={used[1]}&size=3&cursor={cursor}")
+    assert r.status_code == 200
+    assert re.findall(r"<td>(TEC-\d+)</td>", r.get_data(as_text=True)) == pages(client, sort=used[0], order=used[1], size=3)[0]
+
+
+@pytest.mark.parametrize("token", ["not-base64!", main.encode_cursor(("x", 1), "receipt", "asc"),
+                                   main.encode_cursor(([1, "TEC-0001"], "3"), "receipt", "asc")])
+def test_malformed_cursor_starts_over(client, booked, token):
+    r = client.get(f"/index?sort=receipt&size=3&cursor={token}")
+    assert r.status_code == 200
+    assert re.findall(r"<td>(TEC-\d+)</td>", r.get_data(as_text=True)) == ["TEC-0001", "TEC-0002", "TEC-0003"]
@@ -0,0 +1,53 @@
+import pytest
+
+
+@pytest.fixture
+def guests(store, values):
+    # Added substring, prefix, exact so receipt order is the reverse of rank.
+    for i, (guest, check_in, check_out) in enumerate([
+            ("Joanne Eze", "2025-02-01", "2025-02-03"), ("Annabel Okoro", "2025-03-01", "2025-03-03"),
+            ("Ann Obi", "2025-04-01", "2025-04-03"), ("Bola Ade", "2025-03-05", "2025-03-07")]):
+        row = values(i, check_in=check_in, check_out=check_out)
+        row[0] = guest
+        store.append(row)
+    return store
+
+
+def names(records):
+    return [record["Guest Name"] for record in records]
+
+
+def test_exact_words_rank_above_prefixes_above_substrings(guests):
+    records, total = guests.search("ann")
+    assert names(records) == ["Ann Obi", "Annabel Okoro", "Joanne Eze"]
+    assert total == 3
+
+
+def test_every_term_must_match(guests):
+    assert names(guests.search("ann obi")[0]) == ["Ann Obi"]
+    assert guests.search("ann ade") == ([], 0)
+
+
+def test_date_filters_apply_with_and_without_a_query(guests):
+    assert names(guests.search("ann", check_in_from="2025-03-01", check_in_to="2025-03-31")[0]) == ["Annabel Okoro"]
+    records, total = guests.search("", check_in_from="2025-03-01", check_out_to="2025-03-04")
+    assert (names(records), total) == (["Annabel Okoro"], 1)
+
+
+def test_limit_caps_records_but_not_the_total(guests):
+    records, total = guests.search("ann", limit=2)
+    assert names(records) == ["Ann Obi", "Annabel Okoro"]
+    assert total == 3
+
+
+def test_search_follows_updates(guests):
+    guests.search("ann")  # builds the index
+    receipt = guests.search("joanne")[0][0]["Receipt No"]
+    guests.update(receipt, dict(guests.find(receipt).items(), **{"Guest Name": "Joan Eze"}))
+    assert names(guests.search("ann")[0]) == ["Ann Obi", "Annabel Okoro"]
+
+
+def test_search_page_shows_ranked_rows_and_the_total(client, guests):
+    html = client.get("/search?q=ann").get_data(as_text=True)
+    assert html.index("Ann Obi") < html.index("Annabel Okoro") < html.index("Joanne Eze")
+    assert "3 matches" in html
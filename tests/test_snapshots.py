@@ -0,0 +1,68 @@
+import io
+import threading
+import time
+
+import openpyxl
+
+import main
+
+
+def guests(data):
+    ws = openpyxl.load_workbook(io.BytesIO(data))["Reservations"]
+    return [row[1] for row in ws.iter_rows(min_row=2, values_only=True)]
+
+
+def wait_for_build(snapshots, version, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not (snapshots.latest and snapshots.latest[0] == version):
+        assert time.monotonic() < deadline, "snapshot was never rebuilt"
+        time.sleep(0.01)
+
+
+def test_writes_schedule_a_rebuild(client, store, values):
+    store.append(values(1))
+    wait_for_build(main.SNAPSHOTS, store.version())
+    r = client.get("/download")
+    assert r.headers["ETag"] == f'"{store.version()}"'
+    assert guests(r.data) == ["Guest 1"]
+
+
+def test_download_serves_newest_complete_snapshot_without_waiting(client, store, values, monkeypatch):
+    store.append(values(1))
+    wait_for_build(main.SNAPSHOTS, store.version())
+    old = store.version()
+
+    release = threading.Event()
+    build = main.XlsxSnapshots._build
+    monkeypatch.setattr(main.XlsxSnapshots, "_build", lambda self, *a: release.wait(5) and build(self, *a))
+    store.append(values(2))
+
+    start = time.monotonic()
+    r = client.get("/download")
+    assert time.monotonic() - start < 1
+    assert r.headers["ETag"] == f'"{old}"'
+    assert guests(r.data) == ["Guest 1"]
+
+    release.set()
+    r = client.get("/download?fresh=1")
+    assert r.headers["ETag"] == f'"{store.version()}"'
+    assert guests(r.data) == ["Guest 1", "Guest 2"]
+    assert client.get("/download", headers={"If-None-Match": r.headers["ETag"]}).status_code == 304
+
+
+def test_leased_snapshot_is_not_pruned(store, values, tmp_path):
+    snapshots = main.SNAPSHOTS
+    snapshots.keep = 1
+    store.append(values(1))
+    wait_for_build(snapshots, store.version())
+    version, path = snapshots.get()
+
+    for i in range(2, 4):
+        store.append(values(i))
+        wait_for_build(snapshots, store.version())
+    assert (tmp_path / "snapshots" / path.rsplit("/", 1)[-1]).exists()
+
+    snapshots.release(path)
+    store.append(values(4))
+    wait_for_build(snapshots, store.version())
+    assert not (tmp_path / "snapshots" / path.rsplit("/", 1)[-1]).exists()
@@ -0,0 +1,49 @@
+import threading
+
+import main
+
+
+def test_concurrent_appends_get_unique_receipts(make_store, values):
+    # Two stores over the same files stand in for two worker processes.
+    stores = [make_store(), make_store()]
+    receipts = []
+    lock = threading.Lock()
+
+    def book(store, start):
+        for i in range(start, start + 25):
+            receipt_no = store.append(values(i))
+            with lock:
+                receipts.append(receipt_no)
+
+    threads = [threading.Thread(target=book, args=(stores[n % 2], n * 25)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(receipts) == len(set(receipts)) == 200
+    assert sorted(row[0] for row in make_store().all()) == sorted(receipts)
+
+
+def test_writer_survives_a_failed_commit(make_store, values, tmp_path):
+    # The journal's lock file can't be opened until its folder exists.
+    journal_dir = tmp_path / "journal"
+    store = make_store(journal=str(journal_dir / "journal.jsonl"))
+    result = {}
+
+    def append():
+        try:
+            result["receipt"] = store.append(values(1))
+        except Exception as e:
+            result["error"] = e
+
+    t = threading.Thread(target=append, daemon=True)
+    t.start()
+    t.join(5)
+    assert not t.is_alive(), "append() never returned"
+    assert isinstance(result["error"], OSError)
+
+    journal_dir.mkdir()
+    assert store.append(values(2)) == main.next_id_code(0)
+    assert [row[1] for row in store.all()] == ["Guest 2"]
+